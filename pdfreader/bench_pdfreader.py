@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# v. 0.5.6
+# benchmarks for pdfViewer.py
+#
+# how to start: bench_pdfreader.py render [FILE] [ZOOM]
+#               bench_pdfreader.py search [PAGES] [WORKERS]
+#               bench_pdfreader.py open [FILE] [WORKERS]
+
+import os
+import sys
+import time
+import random
+import tempfile
+import fitz
+import tkinter as tk
+import engine_pdfreader
+from engine_pdfreader import fimage_data, fworker_pool, fworker_search, fload_buffer
+
+# default document and zoom
+bench_file = os.path.join("doc", "example_045.pdf")
+bench_zoom = 2.5
+
+
+# page to tk.PhotoImage: png path against raw samples path
+def brender(filename, zoom):
+    root = tk.Tk()
+    root.withdraw()
+    doc = fitz.open(filename, filetype="pdf")
+    mat = fitz.Matrix(zoom, zoom)
+    # seconds: rasterization, png path, raw path
+    t_pix = 0
+    t_png = 0
+    t_raw = 0
+    for n in range(len(doc)):
+        page = doc.loadPage(n)
+        t0 = time.perf_counter()
+        pix = page.getPixmap(matrix=mat, colorspace=fitz.csRGB, alpha=0)
+        t1 = time.perf_counter()
+        img = tk.PhotoImage(data=pix.getImageData("png"))
+        t2 = time.perf_counter()
+        img2 = tk.PhotoImage(data=fimage_data(pix))
+        t3 = time.perf_counter()
+        t_pix += t1 - t0
+        t_png += t2 - t1
+        t_raw += t3 - t2
+        img = None
+        img2 = None
+    pages = len(doc)
+    doc.close()
+    root.destroy()
+    print("{}: {} pages at zoom {}".format(os.path.basename(filename), pages, zoom))
+    print("rasterization: {:8.2f} ms/page".format(t_pix*1000/pages))
+    print("png path:      {:8.2f} ms/page".format(t_png*1000/pages))
+    print("raw path:      {:8.2f} ms/page".format(t_raw*1000/pages))
+
+
+# a document of pages full of text
+# the word to search is in some pages
+def fmake_doc(filename, pages, word):
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+             "sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore", "et", "dolore"]
+    rnd = random.Random(0)
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.newPage()
+        lines = []
+        for i in range(60):
+            line = [rnd.choice(words) for k in range(12)]
+            if rnd.random() < 0.02:
+                line[rnd.randrange(12)] = word
+            lines.append(" ".join(line))
+        page.insertText(fitz.Point(40, 40), "\n".join(lines), fontsize=9)
+    doc.save(filename)
+    doc.close()
+
+# whole document search with 1 to N worker processes
+def bsearch(pages, max_workers):
+    word = "needle"
+    filename = os.path.join(tempfile.mkdtemp(), "bench_search.pdf")
+    print("creating {} pages...".format(pages))
+    fmake_doc(filename, pages, word)
+    t_one = None
+    for workers in range(1, max_workers+1):
+        pool = fworker_pool(filename, "", workers)
+        # the workers are started and the document opened
+        list(pool.map(fworker_search, [word]*workers, [0]*workers, [0]*workers))
+        t0 = time.perf_counter()
+        jobs = [pool.submit(fworker_search, word, first, min(first+8, pages)) for first in range(0, pages, 8)]
+        hits = 0
+        for job in jobs:
+            for pno, areas in job.result():
+                hits += len(areas)
+        t = time.perf_counter() - t0
+        pool.shutdown()
+        if t_one is None:
+            t_one = t
+        print("{:2d} workers: {:8.3f} s  speedup {:5.2f}  ({} hits)".format(workers, t, t_one/t, hits))
+    os.remove(filename)
+
+
+# memory of this process in kB: proportional set size if known
+def fmemory():
+    for path, field in (("/proc/self/smaps_rollup", "Pss:"), ("/proc/self/status", "VmRSS:")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+    return 0
+
+# opening time and memory of a worker process
+# it waits a little: each worker gets one of these jobs
+def fworker_stats(wait):
+    t0 = time.perf_counter()
+    len(engine_pdfreader._wdoc)
+    engine_pdfreader._wdoc.loadPage(0)
+    t = time.perf_counter() - t0
+    time.sleep(wait)
+    return t, fmemory()
+
+# worker processes opening the document from the path or from memory
+def bopen(filename, workers):
+    size = os.path.getsize(filename)
+    print("{}: {:.1f} MB, {} workers".format(os.path.basename(filename), size/1048576, workers))
+    for use_mmap in (0, 1):
+        t0 = time.perf_counter()
+        buffer = None
+        if use_mmap:
+            buffer = fload_buffer(filename)
+        t_read = time.perf_counter() - t0
+        pool = fworker_pool(filename, "", workers, buffer)
+        stats = [job.result() for job in [pool.submit(fworker_stats, 0.5) for i in range(workers)]]
+        t = time.perf_counter() - t0 - 0.5
+        memory = fmemory() + sum(m for ts, m in stats)
+        pool.shutdown()
+        buffer = None
+        print("{:5s}: read {:7.1f} ms  first page {:7.1f} ms/worker  all ready {:7.1f} ms  memory {:8.1f} MB".format(
+                "mmap" if use_mmap else "path", t_read*1000, sum(ts for ts, m in stats)*1000/workers, t*1000, memory/1024))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: bench_pdfreader.py render [FILE] [ZOOM]")
+        print("       bench_pdfreader.py search [PAGES] [WORKERS]")
+        print("       bench_pdfreader.py open [FILE] [WORKERS]")
+        sys.exit()
+    if sys.argv[1] == "render":
+        filename = bench_file
+        zoom = bench_zoom
+        if len(sys.argv) > 2:
+            filename = sys.argv[2]
+        if len(sys.argv) > 3:
+            zoom = float(sys.argv[3])
+        brender(filename, zoom)
+    elif sys.argv[1] == "search":
+        pages = 2000
+        workers = os.cpu_count()
+        if len(sys.argv) > 2:
+            pages = int(sys.argv[2])
+        if len(sys.argv) > 3:
+            workers = int(sys.argv[3])
+        bsearch(pages, workers)
+    elif sys.argv[1] == "open":
+        filename = bench_file
+        workers = 4
+        if len(sys.argv) > 2:
+            filename = sys.argv[2]
+        if len(sys.argv) > 3:
+            workers = int(sys.argv[3])
+        bopen(filename, workers)
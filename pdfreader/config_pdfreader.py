@@ -8,3 +8,33 @@ USE_ALPHA=0
 PAGE_BG="gray90"
 # right pad for the horizontal scrollbar
 hsb_pad=16
+# pages rendered in background before and after the current one (0 to disable)
+prefetch_depth=2
+# memory for the rendered pages, in MB
+render_cache_size=200
+# use 1 to show all the pages one below the other, otherwise 0
+continuous_mode=0
+# from this zoom only the visible part of the page is rendered, in tiles (0 to disable)
+tile_zoom=5
+# size of the tiles in pixels
+tile_size=512
+# use 1 to print the counters of the caches at exit, otherwise 0
+print_stats=0
+# processes searching the whole document (0: one for each cpu core)
+search_workers=0
+# the annotations are saved into the file after this many milliseconds without other changes
+annot_save_delay=2000
+# use 1 to read the file once in memory (mmap) and let the worker processes open it from there, otherwise 0
+use_mmap=0
+# width of the thumbnails in the side panel, in pixels
+thumb_width=120
+# processes rendering the thumbnails
+thumb_workers=2
+# disk space for the rendered pages kept between sessions, in MB (0 to disable)
+disk_cache_size=500
+# pages slower than this to render (ms) are first shown at low resolution, then refined in background (0 to disable)
+progressive_ms=300
+# the preview is rendered at the zoom divided by this value
+preview_factor=4
+# the most hits found in each page by the searching
+search_hit_max=4096
@@ -0,0 +1,760 @@
+# v. 0.5.6
+# rendering helpers used by pdfViewer.py
+
+import os
+import json
+import hashlib
+import mmap
+import pickle
+import zlib
+import concurrent.futures
+import multiprocessing
+from array import array
+from collections import OrderedDict
+import fitz
+# optional: faster word selection
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# the pixmap as image data for tk.PhotoImage
+# the raw samples get a ppm (rgb) or pgm (gray) header:
+# no png compression and decompression at every render
+def fimage_data(pix):
+    # ppm and pgm do not have the alpha channel
+    if pix.alpha:
+        return pix.getImageData("png")
+    if pix.n == 1:
+        magic = b"P5"
+    else:
+        magic = b"P6"
+    return magic + b"\n%d %d\n255\n" % (pix.width, pix.height) + pix.samples
+
+
+# the page data turned by rot degrees (multiple of 90, clockwise)
+# instead of rendering the page again: numpy or slices of the samples
+# None for png data (with alpha)
+def frotate_data(data, rot):
+    width, height, image = data
+    turns = rot // 90 % 4
+    if turns == 0:
+        return data
+    magic = image[:2]
+    if magic not in (b"P5", b"P6"):
+        return None
+    n = 1 if magic == b"P5" else 3
+    body = image[len(magic + b"\n%d %d\n255\n" % (width, height)):]
+    if numpy is not None:
+        samples = numpy.frombuffer(body, dtype=numpy.uint8).reshape(height, width, n)
+        body = numpy.rot90(samples, -turns).tobytes()
+    else:
+        out = bytearray(len(body))
+        row = width * n
+        if turns == 2:
+            # the pixels in reverse order
+            for c in range(n):
+                out[c::n] = body[c::n][::-1]
+        else:
+            # each column becomes a row
+            nrow = height * n
+            for y in range(width):
+                for c in range(n):
+                    if turns == 1:
+                        # clockwise: the column from the bottom
+                        col = body[y*n+c::row][::-1]
+                    else:
+                        col = body[(width-1-y)*n+c::row]
+                    out[y*nrow+c:(y+1)*nrow:n] = col
+        body = bytes(out)
+    if turns % 2:
+        width, height = height, width
+    return (width, height, magic + b"\n%d %d\n255\n" % (width, height) + body)
+
+# the rendered pages in memory
+# key: (page, zoom, rotation, alpha, paper colour) - value: (width, height, data)
+# the least recently used pages are removed when over max_bytes
+class RenderCache:
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        # bytes in use
+        self.size = 0
+        # pages found or not
+        self.hits = 0
+        self.misses = 0
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    # the rendered page or None
+    def fget(self, key):
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return data
+    
+    # store a rendered page
+    def fput(self, key, data):
+        # too big
+        if len(data[2]) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key)[2])
+        self.entries[key] = data
+        self.size += len(data[2])
+        while self.size > self.max_bytes:
+            self.size -= len(self.entries.popitem(last=False)[1][2])
+    
+    # remove the renderings of the page pno
+    def finvalidate(self, pno):
+        for key in [k for k in self.entries if k[0] == pno]:
+            self.size -= len(self.entries.pop(key)[2])
+    
+    # remove everything
+    def fclear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+# rectangles of a page in buckets of a grid
+# the rectangles at a point are found without looking at all of them
+class RectGrid:
+    
+    def __init__(self, cell=32):
+        # size of a cell in page units
+        self.cell = cell
+        # key: (column, row) - value: list of [rect, item]
+        self.cells = {}
+    
+    # add a rectangle to each cell it touches
+    def fadd(self, rect, item):
+        c = self.cell
+        entry = [rect, item]
+        for col in range(int(rect[0]//c), int(rect[2]//c)+1):
+            for row in range(int(rect[1]//c), int(rect[3]//c)+1):
+                self.cells.setdefault((col, row), []).append(entry)
+    
+    # the items of the rectangles at x, y, in the order they were added
+    def fall(self, x, y):
+        for rect, item in self.cells.get((int(x//self.cell), int(y//self.cell)), ()):
+            if rect[0] <= x < rect[2] and rect[1] <= y < rect[3]:
+                yield item
+    
+    # the item of the first rectangle added at x, y or None
+    def ffind(self, x, y):
+        return next(self.fall(x, y), None)
+
+
+# the annotations of a page: by xref and by position
+class AnnotIndex:
+    
+    def __init__(self, page):
+        self.page = page
+        # key: xref - value: [type, info, rect, xref]
+        self.items = {}
+        # key: xref - value: the annotation
+        self.annots = {}
+        self.grid = RectGrid()
+        annot = page.firstAnnot
+        while annot:
+            item = [annot.type, annot.info, annot.rect, annot.xref]
+            self.items[annot.xref] = item
+            self.annots[annot.xref] = annot
+            self.grid.fadd(annot.rect, item)
+            annot = annot.next
+    
+    # the first annotation at x, y of one of the types or None
+    def ffind(self, x, y, types):
+        for item in self.grid.fall(x, y):
+            if item[0][0] in types:
+                return item
+        return None
+
+
+# the words of a page for the text selection
+# the boxes are in a numpy array if numpy is installed
+class PageWords:
+    
+    def __init__(self, words):
+        # the text of each word
+        self.words = [w[4] for w in words]
+        # x0, y0, x1, y1 of each word
+        if numpy is not None:
+            self.boxes = numpy.array([w[:4] for w in words], dtype=numpy.float32).reshape(-1, 4)
+        else:
+            self.boxes = [tuple(w[:4]) for w in words]
+    
+    # the words touching rect, by line: top to bottom, left to right
+    # return a list of lists of word numbers
+    def flines(self, rect):
+        b = self.boxes
+        if numpy is not None:
+            mask = (b[:,0] < rect[2]) & (b[:,2] > rect[0]) & (b[:,1] < rect[3]) & (b[:,3] > rect[1])
+            idx = numpy.nonzero(mask)[0]
+            idx = idx[numpy.lexsort((b[idx,0], b[idx,3]))].tolist()
+        else:
+            idx = [i for i, w in enumerate(b) if w[0] < rect[2] and w[2] > rect[0] and w[1] < rect[3] and w[3] > rect[1]]
+            idx.sort(key=lambda i: (b[i][3], b[i][0]))
+        # same bottom: same line
+        lines = []
+        last = None
+        for i in idx:
+            if b[i][3] != last:
+                lines.append([])
+                last = b[i][3]
+            lines[-1].append(i)
+        return lines
+    
+    # the text of the lines
+    def ftext(self, lines):
+        return "\n".join(" ".join(self.words[i] for i in line) for line in lines)
+    
+    # a rectangle around each line
+    def frects(self, lines):
+        rects = []
+        for line in lines:
+            boxes = [self.boxes[i] for i in line]
+            rects.append((min(w[0] for w in boxes), min(w[1] for w in boxes),
+                          max(w[2] for w in boxes), max(w[3] for w in boxes)))
+        return rects
+
+
+########## DISK CACHE ############
+
+# the cache folder of this program - XDG_CACHE_HOME or ~/.cache
+def fcache_dir(name):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "tkpdfreader", name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# hash of the content of the files already read
+# key: (path, size, modification time) - value: hash
+_hashes = {}
+
+# hash of the content of a file
+def ffile_hash(filename):
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+    if key not in _hashes:
+        h = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1024*1024), b""):
+                h.update(chunk)
+        _hashes[key] = h.hexdigest()
+    return _hashes[key]
+
+# write a file in the cache: the readers never see it half written
+def fcache_write(path, data):
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# the rendered pages in the cache folder, shared by the programs running
+# key: (file hash, page, zoom, rotation, alpha, paper colour) - value: (width, height, data)
+# the least recently used pages are removed when over max_bytes
+class DiskCache:
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.path = fcache_dir("pages")
+        # bytes written since the last check of the size
+        self.written = max_bytes
+        # pages found or not
+        self.hits = 0
+        self.misses = 0
+    
+    # the file of a page
+    def fname(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest()+".pg")
+    
+    # the rendered page or None
+    def fget(self, key):
+        path = self.fname(key)
+        try:
+            with open(path, "rb") as f:
+                size = f.readline().split()
+                data = zlib.decompress(f.read())
+            # recently used
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return (int(size[0]), int(size[1]), data)
+    
+    # store a rendered page
+    def fput(self, key, value):
+        w, h, data = value
+        data = b"%d %d\n" % (w, h) + zlib.compress(data, 1)
+        try:
+            fcache_write(self.fname(key), data)
+        except OSError:
+            return
+        self.written += len(data)
+        if self.written > self.max_bytes // 10:
+            self.fevict()
+    
+    # remove the oldest pages over the limit
+    def fevict(self):
+        self.written = 0
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(".pg"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            # another program could remove it too
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+# the changes of the annotations not yet saved into the file
+# a json line for each change, on disk as soon as it is made
+# the first line: size and modification time of the file they apply to
+class Journal:
+    
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        name = hashlib.sha1(self.filename.encode()).hexdigest()
+        self.path = os.path.join(fcache_dir("journal"), name+".jnl")
+    
+    # the file as it is now
+    def fbase(self):
+        st = os.stat(self.filename)
+        return {"size": st.st_size, "mtime": st.st_mtime_ns}
+    
+    # the changes made in a previous session and never saved
+    def fpending(self):
+        try:
+            with open(self.path, "r") as f:
+                lines = f.read().splitlines()
+            # the file has been changed in the meanwhile
+            if not lines or json.loads(lines[0]) != self.fbase():
+                return []
+        except (OSError, ValueError):
+            return []
+        ops = []
+        for line in lines[1:]:
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                # the last line half written
+                break
+        return ops
+    
+    # the file has been saved: no change pending
+    def fcommit(self):
+        fcache_write(self.path, (json.dumps(self.fbase())+"\n").encode())
+    
+    # a new change
+    def fappend(self, op):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(op)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+########## SEARCH INDEX ############
+
+# the words of the whole document: word -> pages -> positions
+class SearchIndex:
+    
+    # change it if the data stored change
+    version = 1
+    
+    def __init__(self, page_count):
+        self.page_count = page_count
+        # the lowercase words found - position is the word id
+        self.vocab = []
+        self.vocab_ids = {}
+        # for each page: word ids in reading order
+        self.page_words = []
+        # for each page: x0, y0, x1, y1 of each word
+        self.page_boxes = []
+        # for each page: block and line of each word
+        self.page_lines = []
+        # word id -> pages with that word
+        self.postings = []
+    
+    # add the words of each page
+    def fbuild(self, doc):
+        for pno in range(self.page_count):
+            ids = array("I")
+            boxes = array("f")
+            lines = array("I")
+            for w in doc.loadPage(pno).getTextWords():
+                word = w[4].lower()
+                wid = self.vocab_ids.get(word)
+                if wid is None:
+                    wid = len(self.vocab)
+                    self.vocab.append(word)
+                    self.vocab_ids[word] = wid
+                    self.postings.append(array("I"))
+                ids.append(wid)
+                boxes.extend(w[:4])
+                lines.append((w[5] << 16) | w[6])
+                # the page once
+                plist = self.postings[wid]
+                if not plist or plist[-1] != pno:
+                    plist.append(pno)
+            self.page_words.append(ids)
+            self.page_boxes.append(boxes)
+            self.page_lines.append(lines)
+    
+    # same rules of the searching in a page: case insensitive,
+    # the first word can be the end of a word, the last word the beginning
+    # return a list with the rectangles found in each page
+    def fsearch(self, text):
+        areas_list = [[] for i in range(self.page_count)]
+        qwords = text.lower().split()
+        if not qwords:
+            return areas_list
+        # the words allowed at each position of the phrase
+        if len(qwords) == 1:
+            allowed = [set(i for i, w in enumerate(self.vocab) if qwords[0] in w)]
+        else:
+            allowed = [set(i for i, w in enumerate(self.vocab) if w.endswith(qwords[0]))]
+            for q in qwords[1:-1]:
+                wid = self.vocab_ids.get(q)
+                allowed.append(set() if wid is None else {wid})
+            allowed.append(set(i for i, w in enumerate(self.vocab) if w.startswith(qwords[-1])))
+        # the pages with all the words
+        pages = None
+        for ids in allowed:
+            found = set()
+            for wid in ids:
+                found.update(self.postings[wid])
+            pages = found if pages is None else pages & found
+            if not pages:
+                return areas_list
+        n = len(qwords)
+        for pno in sorted(pages):
+            ids = self.page_words[pno]
+            boxes = self.page_boxes[pno]
+            lines = self.page_lines[pno]
+            for i in range(len(ids) - n + 1):
+                if all(ids[i+k] in allowed[k] for k in range(n)):
+                    # a rectangle for each line of the phrase
+                    rect = None
+                    for k in range(i, i+n):
+                        box = fitz.Rect(boxes[4*k:4*k+4])
+                        if rect is not None and lines[k] == lines[k-1]:
+                            rect |= box
+                        else:
+                            if rect is not None:
+                                areas_list[pno].append(rect)
+                            rect = box
+                    areas_list[pno].append(rect)
+        return areas_list
+    
+    # store the index in the cache folder
+    def fsave(self, path):
+        fcache_write(path, pickle.dumps((self.version, self.__dict__), pickle.HIGHEST_PROTOCOL))
+    
+    # an index from the cache folder or None
+    @classmethod
+    def fload(cls, path, page_count):
+        try:
+            with open(path, "rb") as f:
+                version, data = pickle.load(f)
+        except Exception:
+            return None
+        if version != cls.version or data.get("page_count") != page_count:
+            return None
+        index = cls(page_count)
+        index.__dict__.update(data)
+        return index
+
+
+########## LINK MAP ############
+
+# the links of the whole document
+class LinkMap:
+    
+    # change it if the data stored change
+    version = 1
+    
+    def __init__(self, page_count):
+        self.page_count = page_count
+        # for each page: [type, (x0, y0, x1, y1), page or uri]
+        # type 1: go to page - type 2: external link
+        self.page_links = []
+        # key: page - value: list of [page, link position] linking to it
+        self.backlinks = {}
+    
+    # the goto and uri links of each page
+    def fbuild(self, doc):
+        for pno in range(self.page_count):
+            links = []
+            for item in doc.loadPage(pno).getLinks():
+                rect = tuple(item["from"])
+                if item["kind"] == fitz.LINK_GOTO:
+                    links.append([1, rect, item["page"]])
+                    self.backlinks.setdefault(item["page"], []).append([pno, len(links)-1])
+                elif item["kind"] == fitz.LINK_URI:
+                    links.append([2, rect, item["uri"]])
+            self.page_links.append(links)
+    
+    # store the map in the cache folder
+    def fsave(self, path):
+        fcache_write(path, pickle.dumps((self.version, self.__dict__), pickle.HIGHEST_PROTOCOL))
+    
+    # a map from the cache folder or None
+    @classmethod
+    def fload(cls, path, page_count):
+        try:
+            with open(path, "rb") as f:
+                version, data = pickle.load(f)
+        except Exception:
+            return None
+        if version != cls.version or data.get("page_count") != page_count:
+            return None
+        links = cls(page_count)
+        links.__dict__.update(data)
+        return links
+
+
+########## WORKER PROCESS ############
+
+# the document opened by the worker process
+_wdoc = None
+_wfilename = None
+
+# the whole file in memory, read through mmap
+# fitz wants bytes: the forked workers share this copy
+def fload_buffer(filename):
+    with open(filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+
+# open the document in the worker process
+# each worker has its own fitz.Document
+# from the file in memory if buffer is given
+def fworker_init(filename, password, buffer=None):
+    global _wdoc, _wfilename
+    _wfilename = filename
+    if buffer:
+        _wdoc = fitz.open(stream=buffer, filetype="pdf")
+    else:
+        _wdoc = fitz.open(filename, filetype="pdf")
+    if _wdoc.isEncrypted:
+        _wdoc.authenticate(password)
+    # a page rendered at more zooms is interpreted once
+    # only with the fitz of this program
+    if hasattr(_wdoc, "getDisplayListCache"):
+        _wdoc.getDisplayListCache()
+
+# render a page in the worker process
+# the paper colour is not needed here: it is part of the key
+def fworker_render(pno, zoom, rot, alpha, bg=None):
+    mat = fitz.Matrix(zoom, zoom)
+    mat.preRotate(rot)
+    pix = _wdoc.loadPage(pno).getPixmap(matrix=mat, colorspace=fitz.csRGB, alpha=alpha)
+    return (pix.width, pix.height, fimage_data(pix))
+
+# hash of the content of the file in the worker process
+def fworker_hash():
+    return ffile_hash(_wfilename)
+
+# the search index of the document in the worker process
+# from the cache folder, or built and stored
+def fworker_index():
+    path = os.path.join(fcache_dir("index"), ffile_hash(_wfilename)+".idx")
+    index = SearchIndex.fload(path, len(_wdoc))
+    if index is None:
+        index = SearchIndex(len(_wdoc))
+        index.fbuild(_wdoc)
+        index.fsave(path)
+    return index
+
+# the link map of the document in the worker process
+# from the cache folder, or built and stored
+def fworker_links():
+    path = os.path.join(fcache_dir("links"), ffile_hash(_wfilename)+".links")
+    links = LinkMap.fload(path, len(_wdoc))
+    if links is None:
+        links = LinkMap(len(_wdoc))
+        links.fbuild(_wdoc)
+        links.fsave(path)
+    return links
+
+# a small image of the page inside a box of width x height, as png
+def fthumb_data(page, width, height):
+    zoom = min(width/page.rect.width, height/page.rect.height)
+    pix = page.getPixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=0)
+    return (pix.width, pix.height, pix.getImageData("png"))
+
+# the thumbnail of a page in the worker process
+def fworker_thumb(pno, width, height):
+    return fthumb_data(_wdoc.loadPage(pno), width, height)
+
+# the thumbnails of the document in the cache folder
+def fthumbs_path(width):
+    return os.path.join(fcache_dir("thumbs"), "{}_{}.thm".format(ffile_hash(_wfilename), width))
+
+# the thumbnails stored in the cache folder
+# key: page - value: (width, height, png)
+def fworker_thumbs_load(width):
+    try:
+        with open(fthumbs_path(width), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return {}
+
+# store the thumbnails in the cache folder
+def fworker_thumbs_save(width, thumbs):
+    fcache_write(fthumbs_path(width), pickle.dumps(thumbs, pickle.HIGHEST_PROTOCOL))
+
+# search the pages from first to last (excluded) of doc
+# hit_max: the hits kept for each page, found in one pass
+# return a list of [page, rectangles found]
+def fworker_search_doc(doc, text, first, last, hit_max=4096):
+    result = []
+    for pno in range(first, last):
+        areas = doc.loadPage(pno).searchFor(text, hit_max=hit_max)
+        result.append([pno, [tuple(ar) for ar in areas]])
+    return result
+
+# search the pages in the worker process
+def fworker_search(text, first, last, hit_max=4096):
+    return fworker_search_doc(_wdoc, text, first, last, hit_max)
+
+# a pool of worker processes with the document opened
+# fork: the program is not imported again in the workers,
+# and the buffer is not copied
+def fworker_pool(filename, password, workers=1, buffer=None):
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=fworker_init, initargs=(filename, password, buffer))
+
+# stop a pool of worker processes at once:
+# the jobs queued are cancelled and the ones running are killed,
+# otherwise the exit of the program waits for them
+def fworker_stop(pool):
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+# render in background the pages around the current one
+# the rendered pages go into the cache
+class Prefetcher:
+    
+    def __init__(self, filename, password, depth, cache, buffer=None):
+        # pages before and after the current one
+        self.depth = depth
+        self.cache = cache
+        self.pool = fworker_pool(filename, password, buffer=buffer)
+        # key: (page, zoom, rotation, alpha, paper colour) - value: future
+        self.jobs = {}
+        # pages changed after the worker opened the file
+        self.stale = set()
+        # the page shown as a preview
+        self.refine = None
+        # (key, data) of the jobs moved into the cache
+        self.collected = []
+        # pages still in the worker when needed
+        self.hits = 0
+        self.misses = 0
+    
+    # the page being rendered or None
+    def fget(self, key):
+        if key[0] in self.stale:
+            return None
+        data = None
+        job = self.jobs.pop(key, None)
+        # already in the worker: waiting is faster than rendering again
+        if job is not None and not job.cancel():
+            try:
+                data = job.result()
+            except Exception:
+                data = None
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+    
+    # render the pages near the page pno
+    def frequest(self, pno, zoom, rot, alpha, bg, page_count):
+        keys = []
+        for i in range(1, self.depth+1):
+            if pno+i < page_count:
+                keys.append((pno+i, zoom, rot, alpha, bg))
+            if pno-i >= 0:
+                keys.append((pno-i, zoom, rot, alpha, bg))
+        # drop the pages no longer needed
+        for key in list(self.jobs):
+            if key not in keys and key != self.refine:
+                self.jobs.pop(key).cancel()
+        # the next pages first
+        for key in keys:
+            if key[0] in self.stale:
+                continue
+            if key not in self.cache and key not in self.jobs:
+                self.jobs[key] = self.pool.submit(fworker_render, *key)
+    
+    # render the page shown as a preview before the others
+    def frefine(self, key):
+        self.refine = key
+        if key not in self.jobs:
+            self.jobs[key] = self.pool.submit(fworker_render, *key)
+    
+    # the preview is no longer shown
+    def frefine_cancel(self):
+        if self.refine is not None:
+            job = self.jobs.pop(self.refine, None)
+            if job is not None:
+                job.cancel()
+            self.refine = None
+    
+    # the page pno has been changed: the worker would render the old one
+    def fdrop(self, pno):
+        self.stale.add(pno)
+        for key in [k for k in self.jobs if k[0] == pno]:
+            self.jobs.pop(key).cancel()
+    
+    # move the finished jobs into the cache
+    # return True if some job is still running
+    def fcollect(self):
+        for key in list(self.jobs):
+            job = self.jobs[key]
+            if job.done():
+                del self.jobs[key]
+                if not job.cancelled() and job.exception() is None:
+                    self.cache.fput(key, job.result())
+                    self.collected.append((key, job.result()))
+        return bool(self.jobs)
+    
+    # hit/miss counters
+    def fstats(self):
+        return "Cache: {} hits, {} misses - prefetch: {} waited, {} missed".format(
+                    self.cache.hits, self.cache.misses, self.hits, self.misses)
+    
+    # stop the worker
+    def fclose(self):
+        fworker_stop(self.pool)
+        self.jobs = {}
@@ -37,6 +37,8 @@ fitz.Document.searchPageFor = fitz.utils.searchPageFor
 fitz.Document.newPage = fitz.utils.newPage
 fitz.Document.insertPage = fitz.utils.insertPage
 fitz.Document.getCharWidths = fitz.utils.getCharWidths
+fitz.Document.getDisplayListCache = fitz.utils.getDisplayListCache
+fitz.Document.dropDisplayLists = fitz.utils.dropDisplayLists
 
 # ------------------------------------------------------------------------------
 # Page
@@ -66,6 +68,9 @@ fitz.Page.insertImage = fitz.utils.insertImage
 fitz.Page.updateLink = fitz.utils.updateLink
 fitz.Page.newShape = lambda x: fitz.utils.Shape(x)
 
+# the methods changing a page drop its cached DisplayList
+fitz.utils._dropOnChange()
+
 # ------------------------------------------------------------------------------
 # Rect
 # ------------------------------------------------------------------------------
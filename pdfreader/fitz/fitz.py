@@ -2006,6 +2006,7 @@ open(filename, filetype='type') - from file"""
         self.Graftmaps   = {}
         self.ShownPages  = {}
         self._page_refs  = weakref.WeakValueDictionary()
+        self._dlCache    = None
 
         _fitz.Document_swiginit(self, _fitz.new_Document(filename, stream, filetype, rect, width, height, fontsize))
 
@@ -2029,6 +2030,7 @@ open(filename, filetype='type') - from file"""
         if hasattr(self, '_outline') and self._outline:
             self._dropOutline(self._outline)
             self._outline = None
+        self._dlCache    = None
         self._reset_page_refs()
         self.metadata    = None
         self.stream      = None
@@ -2,6 +2,7 @@ from __future__ import division
 from fitz import *
 import math
 import os
+import functools
 import warnings
 import io
 warnings.simplefilter("once")
@@ -304,6 +305,153 @@ def insertImage(page, rect, filename=None, pixmap=None, stream=None, rotate=0,
         )
 
 
+class DisplayListCache():
+    """Document-level cache of page DisplayLists and TextPages.
+
+    Notes:
+        Rendering, searching and text extraction of a page share one
+        interpretation of its content stream. Only the DisplayLists of the
+        'maxpages' most recently used pages are kept (a DisplayList holds
+        the whole page content, its size is not known to Python).
+        The cache is used only after Document.getDisplayListCache() has
+        been called. The Page, Annot and Shape methods changing a page drop
+        it; other changes need Document.dropDisplayLists().
+    """
+
+    def __init__(self, maxpages=8):
+        self.maxpages = maxpages
+        self.pages = {}           # page number -> [DisplayList, {flags: TextPage}]
+        self.order = []           # page numbers, most recently used last
+        self.interpreted = 0      # content streams interpreted
+        self.saved = 0            # interpretations saved
+        self.textpages = 0        # TextPages created
+        self.textpages_saved = 0  # TextPage creations saved
+
+    def _entry(self, page):
+        pno = page.number
+        entry = self.pages.get(pno)
+        if entry is None:
+            entry = [page.getDisplayList(), {}]
+            self.interpreted += 1
+            self.pages[pno] = entry
+            while len(self.order) >= self.maxpages:
+                del self.pages[self.order.pop(0)]
+        else:
+            self.saved += 1
+            self.order.remove(pno)
+        self.order.append(pno)
+        return entry
+
+    def getDisplayList(self, page):
+        """Return the DisplayList of a page."""
+        return self._entry(page)[0]
+
+    def getTextPage(self, page, flags=3):
+        """Return the TextPage of a page created with 'flags'."""
+        entry = self._entry(page)
+        tp = entry[1].get(flags)
+        if tp is None:
+            tp = entry[0].getTextPage(flags)
+            self.textpages += 1
+            entry[1][flags] = tp
+        else:
+            self.textpages_saved += 1
+        return tp
+
+    def drop(self, pno=None):
+        """Forget the page 'pno', or all pages if None."""
+        if pno is None:
+            self.pages = {}
+            self.order = []
+        elif pno in self.pages:
+            del self.pages[pno]
+            self.order.remove(pno)
+
+    def stats(self):
+        """Return a string with the interpretations done and saved."""
+        return "DisplayLists: %i interpreted, %i saved; TextPages: %i created, %i saved" % (
+            self.interpreted, self.saved, self.textpages, self.textpages_saved)
+
+
+def getDisplayListCache(doc):
+    """Return the DisplayList cache of the document (created when first needed).
+
+    Notes:
+        Until this is called, every page is interpreted again at each use.
+    """
+    if doc.isClosed:
+        raise ValueError("document closed")
+    if getattr(doc, "_dlCache", None) is None:
+        doc._dlCache = DisplayListCache()
+    return doc._dlCache
+
+
+def dropDisplayLists(doc, pno=None):
+    """Forget the cached DisplayList and TextPages of page 'pno' (all pages if None).
+
+    Notes:
+        Needed after a page has been modified, e.g. by adding or deleting annotations.
+    """
+    if getattr(doc, "_dlCache", None) is not None:
+        doc._dlCache.drop(pno)
+
+
+def _getDisplayList(page):
+    """Return the DisplayList of a page: cached if the document has the cache."""
+    cache = getattr(page.parent, "_dlCache", None)
+    if cache is None:
+        return page.getDisplayList()
+    return cache.getDisplayList(page)
+
+
+def _getTextPage(page, flags=3):
+    """Return the TextPage of a page: cached if the document has the cache."""
+    cache = getattr(page.parent, "_dlCache", None)
+    if cache is None:
+        return page.getDisplayList().getTextPage(flags)
+    return cache.getTextPage(page, flags)
+
+
+def _changesPage(getPage):
+    """Decorator for the methods changing a page: its DisplayList is dropped.
+
+    Args:
+        getPage: function returning the page from the object of the method.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            rc = func(self, *args, **kwargs)
+            try:
+                page = getPage(self)
+                if page is not None:
+                    dropDisplayLists(page.parent, page.number)
+            except ReferenceError:      # the owning page or document is gone
+                pass
+            return rc
+        return wrapper
+    return decorator
+
+
+def _dropOnChange():
+    """Make the methods of Page, Annot and Shape changing a page drop its DisplayList."""
+    page_methods = ("addLineAnnot", "addTextAnnot", "addInkAnnot", "addStampAnnot",
+                    "addFileAnnot", "addStrikeoutAnnot", "addUnderlineAnnot",
+                    "addSquigglyAnnot", "addHighlightAnnot", "addRectAnnot",
+                    "addCircleAnnot", "addPolylineAnnot", "addPolygonAnnot",
+                    "addFreetextAnnot", "addWidget", "setCropBox", "deleteLink",
+                    "deleteAnnot", "setRotation", "_addAnnot_FromString",
+                    "_cleanContents", "_showPDFpage", "_insertImage", "_setContents")
+    annot_methods = ("_setAP", "setRect", "update", "setColors", "setLineEnds",
+                     "setOpacity", "fileUpd", "setInfo", "setBorder", "setFlags",
+                     "updateWidget")
+    for name in page_methods:
+        setattr(Page, name, _changesPage(lambda page: page)(getattr(Page, name)))
+    for name in annot_methods:
+        setattr(Annot, name, _changesPage(lambda annot: annot.parent)(getattr(Annot, name)))
+    Shape.commit = _changesPage(lambda shape: shape.page)(Shape.commit)
+
+
 def searchFor(page, text, hit_max = 16, quads = False):
     """ Search for a string on a page.
 
@@ -315,11 +463,10 @@ def searchFor(page, text, hit_max = 16, quads = False):
         a list of rectangles or quads, each containing one occurrence.
     """
     CheckParent(page)
-    dl = page.getDisplayList()         # create DisplayList
-    tp = dl.getTextPage()              # create TextPage
+    # the cached TextPage if the document has the cache
+    tp = _getTextPage(page)
     # return list of hitting reactangles
     rlist = tp.search(text, hit_max = hit_max, quads = quads)
-    dl = None
     tp = None
     return rlist
 
@@ -352,26 +499,22 @@ def getTextBlocks(page, images=False):
         text lines, block type and running block number.
     """
     CheckParent(page)
-    dl = page.getDisplayList()
     flags = TEXT_PRESERVE_LIGATURES | TEXT_PRESERVE_WHITESPACE
     if images:
         flags |= TEXT_PRESERVE_IMAGES
-    tp = dl.getTextPage(flags)
+    tp = _getTextPage(page, flags)
     l = []
     tp._extractTextBlocks_AsList(l)
     del tp
-    del dl
     return l
 
 def getTextWords(page):
     """Return the text words as a list with the bbox for each word.
     """
     CheckParent(page)
-    dl = page.getDisplayList()
-    tp = dl.getTextPage()
+    tp = _getTextPage(page)
     l = []
     tp._extractTextWords_AsList(l)
-    del dl
     del tp
     return l
 
@@ -385,7 +528,6 @@ def getText(page, output="text"):
         the output of TextPage methods extractText, extractHTML, extractDICT, extractJSON, extractRAWDICT, extractXHTML or etractXML respectively. Default and misspelling choice is "text".
     """
     CheckParent(page)
-    dl = page.getDisplayList()
     # available output types
     formats = ("text", "html", "json", "xml", "xhtml", "dict", "rawdict")
     # choose which of them also include images in the TextPage
@@ -399,7 +541,8 @@ def getText(page, output="text"):
     if images[f] :
         flags |= TEXT_PRESERVE_IMAGES
 
-    tp = dl.getTextPage(flags)     # TextPage with or without images
+    # TextPage with or without images
+    tp = _getTextPage(page, flags)
 
     if f == 2:
         t = tp.extractJSON()
@@ -410,7 +553,6 @@ def getText(page, output="text"):
     else:
         t = tp._extractText(f)
 
-    del dl
     del tp
     return t
 
@@ -452,7 +594,7 @@ def getPixmap(page, matrix=None, colorspace=csRGB, clip=None,
     if cs.n not in (1,3,4):
         raise ValueError("unsupported colorspace")
 
-    dl = page.getDisplayList()               # create DisplayList
+    dl = _getDisplayList(page)
     if clip:
         scissor = Rect(clip)
     else:
@@ -561,8 +703,19 @@ def getToC(doc, simple = True):
         simple: a bool to control output. Returns a list, where each entry consists of outline level, title, page number and link destination (if simple = False). For details see PyMuPDF's documentation.
     """
 
-    def recurse(olItem, liste, lvl):
-        '''Recursively follow the outline item chain and record item information in a list.'''
+    # check if document is open and not encrypted
+    if doc.isClosed:
+        raise ValueError("document closed")
+    doc.initData()
+    olItem = doc.outline
+
+    if not olItem: return []
+    liste = []
+    # the outline items still to follow, with their level
+    # a loop instead of recursion: deep outlines do not hit the recursion limit
+    stack = [(olItem, 1)]
+    while stack:
+        olItem, lvl = stack.pop()
         while olItem:
             if olItem.title:
                 title = olItem.title
@@ -584,20 +737,13 @@ def getToC(doc, simple = True):
                 liste.append([lvl, title, page])
 
             if olItem.down:
-                liste = recurse(olItem.down, liste, lvl+1)
-            olItem = olItem.next
-        return liste
-
-    # check if document is open and not encrypted
-    if doc.isClosed:
-        raise ValueError("document closed")
-    doc.initData()
-    olItem = doc.outline
-
-    if not olItem: return []
-    lvl = 1
-    liste = []
-    return recurse(olItem, liste, lvl)
+                # the next items of this level after the ones below
+                stack.append((olItem.next, lvl))
+                olItem = olItem.down
+                lvl += 1
+            else:
+                olItem = olItem.next
+    return liste
 
 def getRectArea(*args):
     """Calculate area of rectangle.\nparameter is one of 'px' (default), 'in', 'cm', or 'mm'."""
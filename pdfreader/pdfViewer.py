@@ -39,11 +39,13 @@ if not list(map(int, fitz.VersionBind.split("."))) >= [1, 14, 19]:
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import font
-from operator import itemgetter
-from itertools import groupby
 from tkfilebrowser import askopendirname, askopenfilename
 from tkinter import messagebox
 import time
+import bisect
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from engine_pdfreader import fimage_data, frotate_data, fthumb_data, Prefetcher, RenderCache, DiskCache, RectGrid, AnnotIndex, PageWords, Journal, fworker_pool, fworker_stop, fload_buffer, fworker_hash, fworker_index, fworker_links, fworker_search, fworker_search_doc, fworker_thumb, fworker_thumbs_load, fworker_thumbs_save
 
 
 try:
@@ -101,8 +103,71 @@ class Application(ttk.Frame):
         self.zoom = starting_zoom
         # canvas object list
         self.canvas_list = []
-        # ref to pix
-        self.pix = None
+        # size of the page image
+        self.pix_width = 0
+        self.pix_height = 0
+        # position of the page image in the canvas
+        self.page_x0 = 5
+        self.page_y0 = 5
+        # rotation of the page shown
+        self.page_rot = 0
+        # from the page to canvas coords and back
+        self.page_mat = fitz.Matrix(self.zoom, self.zoom)
+        self.page_imat = ~self.page_mat
+        # 1 all the pages one below the other - 0 one page at time
+        self.continuous = continuous_mode
+        # size of each page in points
+        self.page_sizes = []
+        # top of each page in the canvas
+        self.page_tops = []
+        self.layout_width = 0
+        self.layout_height = 0
+        # zoom and rotation of the layout
+        self.layout_key = None
+        # the links of the page under the pointer, if not the current page
+        self.hover_key = None
+        self.hover_links = None
+        # pages in the canvas: page - [canvas id, image]
+        self.shown_pages = {}
+        # the visible pages are checked when idle
+        self.visible_after = None
+        # page, zoom and rotation of the page in tiles
+        self.tile_key = None
+        # the page area in tiles
+        self.tile_bbox = None
+        # the display list of the page in tiles
+        self.tile_dl = None
+        # tiles in the canvas: (column, row) - [canvas id, image]
+        self.tiles_shown = {}
+        # the rendered pages
+        self.render_cache = RenderCache(render_cache_size*1024*1024)
+        # the rendered pages of all the sessions
+        self.disk_cache = None
+        if disk_cache_size > 0:
+            try:
+                self.disk_cache = DiskCache(disk_cache_size*1024*1024)
+            except OSError:
+                self.disk_cache = None
+        # hash of the content of the file - the key of the disk cache
+        self.file_hash = None
+        # time of the last page rendered, in ms
+        self.render_ms = 0
+        # the page shown as a preview, waiting for the full resolution
+        self.refine_key = None
+        self.refine_time = 0
+        self.page_item = None
+        # savings of the file: a hash asked before the last one is old
+        self.saves = 0
+        # pages rendered in background
+        self.prefetch = None
+        self.prefetch_after = None
+        # worker for the other background tasks of the document
+        self.bg_pool = None
+        # background tasks: [future, function called with the result]
+        self.bg_jobs = []
+        self.bg_after = None
+        # the words of the document - built in background
+        self.search_index = None
         
         ######### TOOLBAR
         self.toolb_frame = ttk.Frame(self)
@@ -126,6 +191,8 @@ class Application(ttk.Frame):
         self.page_var.set("Page: 0/0")
         self.page_lbl = ttk.Label(self.toolb_frame, textvariable=self.page_var, width=-1)#, relief="sunken")
         self.page_lbl.grid(row=0, column=3)
+        # the links to the current page
+        self.page_lbl.bind("<Button-1>", self.fbacklinks)
         # page+
         self.plus_image = tk.PhotoImage(file="icons/plus.png")
         self.plus_btn = ttk.Button(self.toolb_frame, image=self.plus_image, width=-1, command=self.fplus)
@@ -175,13 +242,18 @@ class Application(ttk.Frame):
         # free text annot
         self.annot_mb.menu.add_command(label=" Free text", font=("", font_size), image=self.annotf_image, compound=tk.LEFT, command=lambda:self.fannot(2))
 
+        # continuous layout of the pages
+        self.continuous_image = tk.PhotoImage(file="icons/menu-down.png")
+        self.continuous_btn = ttk.Button(self.toolb_frame, image=self.continuous_image, width=-1, command=self.fcontinuous_toggle)
+        self.continuous_btn.grid(column=14, row=0, sticky="w")
+
         # save the embedded file
         self.embed_image = tk.PhotoImage(file="icons/embed.png")
         self.embed_btn = ttk.Button(self.toolb_frame, image=self.embed_image, width=-1, command=self.fembed)
         
         # button quit
         self.quit_image = tk.PhotoImage(file="icons/quit.png")
-        quit_btn = ttk.Button(self, image=self.quit_image, width=-1, command=quit)
+        quit_btn = ttk.Button(self, image=self.quit_image, width=-1, command=self.fquit)
         quit_btn.grid(row=1, column=3, sticky="w")
         
         ### TOC
@@ -192,7 +264,12 @@ class Application(ttk.Frame):
         self.tv_frame.grid(column=0, row=2, sticky="nw")
         # fake label needed to properly resize the frame
         self.fake_lbl = ttk.Label(self.tv_frame, text="")
-        self.tv = ttk.Treeview(self.tv_frame, selectmode="browse", columns=("Page"), height=60)
+        # the outline and the thumbnails
+        self.side_nb = ttk.Notebook(self.tv_frame)
+        self.side_nb.pack(side="left", fill="y", expand=True, anchor="nw")
+        self.toc_frame = ttk.Frame(self.side_nb)
+        self.side_nb.add(self.toc_frame, text="Toc")
+        self.tv = ttk.Treeview(self.toc_frame, selectmode="browse", columns=("Page"), height=60)
         self.tv.pack(side="left", fill="y", expand=True, anchor="nw")
         # column width
         self.tv.column("#0", width=350)
@@ -204,12 +281,50 @@ class Application(ttk.Frame):
         self.s.configure('Treeview', rowheight=self.tv_row_height+2)
         #
         # scrollbar 
-        self.vscrollbar = ttk.Scrollbar(self.tv_frame, orient="vertical", command=self.tv.yview)
-        self.tv.configure(yscrollcommand=self.vscrollbar.set)
+        self.vscrollbar = ttk.Scrollbar(self.toc_frame, orient="vertical", command=self.ftv_yview)
+        self.tv.configure(yscrollcommand=self.ftv_scroll)
         self.vscrollbar.pack(fill="y", expand=True, anchor="nw")
+        # the list of the pages: only the visible rows
+        self.tv.bind("<Configure>", lambda event:self.ftvPages())
+        self.tv.bind("<Button-4>", lambda event:self.ftv_wheel(-3))
+        self.tv.bind("<Button-5>", lambda event:self.ftv_wheel(3))
+        self.tv.bind("<MouseWheel>", lambda event:self.ftv_wheel(-3 if event.delta > 0 else 3))
         self.tv.bind("<<TreeviewSelect>>", self.ftv)
         self.tv.bind("<<TreeviewOpen>>", self.ftvOpen)
         self.tv.bind("<<TreeviewClose>>", self.ftvClose)
+        ## thumbnails
+        self.thumb_frame = ttk.Frame(self.side_nb)
+        self.side_nb.add(self.thumb_frame, text="Pages")
+        self.thumb_canvas = tk.Canvas(self.thumb_frame, width=0, height=0, bg=PAGE_BG, highlightthickness=0)
+        self.thumb_canvas.pack(side="left", fill="both", expand=True)
+        self.thumb_sb = ttk.Scrollbar(self.thumb_frame, orient="vertical", command=self.thumb_canvas.yview)
+        self.thumb_canvas.configure(yscrollcommand=self.fthumb_scroll)
+        self.thumb_sb.pack(side="left", fill="y")
+        self.thumb_canvas.bind("<Button-1>", self.fthumb_click)
+        self.thumb_canvas.bind("<Button-4>", lambda event:self.fthumb_wheel(-1))
+        self.thumb_canvas.bind("<Button-5>", lambda event:self.fthumb_wheel(1))
+        self.thumb_canvas.bind("<Configure>", lambda event:self.fthumbs_later())
+        self.side_nb.bind("<<NotebookTabChanged>>", lambda event:self.fthumbs_start())
+        # box of each thumbnail, and its page number below
+        self.thumb_w = thumb_width
+        self.thumb_h = int(thumb_width*1.42)
+        self.thumb_slot = self.thumb_h + 25
+        # the thumbnails made - key: page - value: (width, height, png)
+        self.thumbs = {}
+        # new thumbnails not yet in the cache folder
+        self.thumbs_new = False
+        # the thumbnails on the canvas - key: page - value: (ids, image)
+        self.thumbs_shown = {}
+        # the workers - key: page - value: future
+        self.thumb_pool = None
+        self.thumb_jobs = {}
+        self.thumb_load = None
+        self.thumb_after = None
+        # the workers crashed: the thumbnails are made here
+        self.thumb_local = False
+        self.thumb_visible_after = None
+        # the rectangle around the current page
+        self.thumb_mark = None
         ### canvas gui part
         # self.s.configure('new.TFrame', background='gray70')
         self.s.configure('new.TFrame', background=PAGE_BG)
@@ -229,11 +344,34 @@ class Application(ttk.Frame):
         self.vbar.config(command=self.canvas.yview)
         #
         self.canvas.pack(side=tk.LEFT, anchor="nw", fill="none")
-        self.canvas.config(xscrollcommand=self.hbar.set, yscrollcommand=self.vbar.set)
+        self.canvas.config(xscrollcommand=self.fxscroll, yscrollcommand=self.fyscroll)
         ####### canvas rubberband
         self.startx = 0
         self.starty = 0
         self.rubberbandBox = None
+        # the file in memory - with use_mmap
+        self.doc_buffer = None
+        # the stages of the opening done in idle time
+        self.open_stages = []
+        self.open_after = None
+        # the page to show next: rotation and scrolling
+        self.show_after = None
+        self.show_rot = 0
+        self.show_yview = None
+        # saving of the annotations
+        self.save_after = None
+        # pages with changes not yet saved
+        self.dirty_pages = set()
+        # the changes of the annotations not yet saved
+        self.journal = None
+        # changes to undo and to redo
+        self.undo_ops = []
+        self.redo_ops = []
+        # the words selected while dragging
+        self.select_ids = []
+        self.select_after = None
+        # the words of the last pages - key: page - value: PageWords
+        self.words_cache = {}
         # rubberband coords
         self.x1 = 0
         self.y1 = 0
@@ -280,6 +418,9 @@ class Application(ttk.Frame):
         self.canvas.bind_all("<Home>", self.ffirst_page)
         # to the last page
         self.canvas.bind_all("<End>", self.flast_page)
+        # undo and redo the changes of the annotations
+        self.canvas.bind_all("<Control-z>", self.fundo)
+        self.canvas.bind_all("<Control-y>", self.fredo)
         #
         # a label at bottom that indicates the link info
         self.label_link_var = tk.StringVar()
@@ -292,13 +433,50 @@ class Application(ttk.Frame):
         #####
         # button for searching in the document
         self.p_btn = ttk.Button(self, text="P-", command=lambda:self.fpfbtn(0))
-        #
-        self.f_btn = ttk.Button(self, text="P+", command=lambda:self.fpfbtn(1))
+        # P+ and the list of all the results
+        self.nav_frame = ttk.Frame(self)
+        self.f_btn = ttk.Button(self.nav_frame, text="P+", command=lambda:self.fpfbtn(1))
+        self.f_btn.pack(side="left")
+        self.results_btn = ttk.Button(self.nav_frame, text="Results", command=self.fresults)
+        self.results_btn.pack(side="left")
+        # hit counter
+        self.hit_var = tk.StringVar()
+        self.hit_label = ttk.Label(self.nav_frame, textvariable=self.hit_var)
+        self.hit_label.pack(side="left", padx=5)
         #
         # searching done - needed to restore the widgets
         self.dsearch = 0
         # list of areas
         self.areas_list = []
+        # the pages with results, sorted
+        self.hit_pages = []
+        # the results in the pages before each page of hit_pages
+        # None if to be counted again
+        self.hit_before = []
+        # all the results
+        self.hit_total = 0
+        # progress of the searching in the whole document
+        self.search_frame = ttk.Frame(self)
+        self.search_pb = ttk.Progressbar(self.search_frame, length=150, mode="determinate")
+        self.search_pb.pack(side="left", padx=5)
+        self.search_cancel_btn = ttk.Button(self.search_frame, text="Cancel", command=self.fsearch_cancel)
+        self.search_cancel_btn.pack(side="left")
+        # worker for the searching in the whole document
+        self.search_pool = None
+        # the workers have the file before the last saving
+        self.search_stale = False
+        # the pages being searched
+        self.search_jobs = []
+        # the text and the pages of each job: searched here if a worker crashes
+        self.search_text = ""
+        self.search_ranges = {}
+        self.search_after = None
+        # pages already searched
+        self.search_scanned = 0
+        # 1 for each page searched
+        self.search_done = bytearray()
+        # the pages before this one have all been searched
+        self.search_front = 0
         #################
         # filename
         self.filename = ""
@@ -312,8 +490,9 @@ class Application(ttk.Frame):
         else:
             messagebox.showerror("Error", "File required.")
             sys.exit()
-        # list of annots: type, content, rect 
-        self.annot_list = []
+        # the annotations of the current page: type, content, rect, xref
+        # read when needed
+        self.annot_index = None
         # needed when the highlight annot is choose from the menu
         # if 1 the use of the clipboard is disabled
         self.annot_hl = 0
@@ -321,14 +500,23 @@ class Application(ttk.Frame):
         self.selected_coords = None
         # list of point for the polygon annot
         self.annot_points = []
-        # list of entries
-        self.list_id = []
+        # outline: key: entry - value: entries one level below
+        self.toc_children = {}
+        # treeview items whose children are not inserted yet - value: entry
+        self.toc_pending = {}
+        # no outline: the treeview lists the pages,
+        # only the rows visible starting from the page tv_first
+        self.tv_paged = False
+        self.tv_first = 0
         # list of list of links info: type, rect, page or uri
         self.rect_link_list = []
-        # this variable let user go to the selected page
-        self.link_selected = 0
-        # this variable to copy to clipboard the external link
-        self.weblink_selected = 0
+        # the same links by position
+        self.link_grid = RectGrid()
+        # the links of the whole document - read in background
+        self.link_map = None
+        # the last pointer position not yet looked at
+        self.motion_xy = None
+        self.motion_after = None
         # the coords of the image to insert
         self.add_image_coords = None
         ## list of links in the current page - type 1 GOTO - type 2 URI
@@ -358,7 +546,8 @@ class Application(ttk.Frame):
         #
         self.fcanvas()
         #
-        self.canvas.yview_moveto(0.001)
+        if not self.continuous:
+            self.canvas.yview_moveto(0.001)
         #
         # needed to restore the widgets later
         if self.dsearch == 1:
@@ -375,7 +564,8 @@ class Application(ttk.Frame):
         #
         self.fcanvas()
         #
-        self.canvas.yview_moveto(0.001)
+        if not self.continuous:
+            self.canvas.yview_moveto(0.001)
         # needed to restore the widgets later
         if self.dsearch == 1:
             self.fpfbtnService()
@@ -401,151 +591,119 @@ class Application(ttk.Frame):
             self.direction = 5
             self.canvas.yview_scroll(1, "units")
         
+        # the pages are already one below the other
+        if self.continuous:
+            return
+        # the canvas still shows the previous page
+        if self.show_after is not None:
+            return
         if self.canvas.yview()[1] == 1.0:
             self.fplus()
         elif self.canvas.yview()[0] == 0.0:
             self.fminus()
     
     # the pointer moves inside the canvas
+    # the links are looked for once for each frame at most
     def cmotion(self, event):
-        cx = self.canvas.canvasx(event.x)/self.zoom
-        cy = self.canvas.canvasy(event.y)/self.zoom
-        # only if the page has not been rotated
-        if abs(self.rotation) == 0:
-            point = fitz.Point(cx, cy)
-            if self.rect_link_list:
-                for item in self.rect_link_list:
-                    prect = item[1]
-                    if point in prect:
-                       # if goto type
-                       if item[0] == 1:
-                           ll = "Go to page: "+str(item[2]+1)
-                           self.label_link_var.set(ll)
-                           # this variable let user go to the page if the link is selected
-                           self.link_selected = item[2]
-                           break
-                       elif item[0] == 2:
-                           ll = "External Link: "+item[2]
-                           self.label_link_var.set(ll)
-                           # this variable to copy the selected link to the clipboard
-                           self.weblink_selected = str(item[2])
-                           break
-                    # 
-                    else:
-                       # reset the variables
-                       self.link_selected = 0
-                       self.weblink_variable = 0
-                       # reset the label
-                       self.label_link_var.set("")
-                       continue
-               
+        self.motion_xy = (event.x, event.y)
+        if self.motion_after is None:
+            self.motion_after = self.after(16, self.fmotion)
+    
+    # the link under the pointer
+    def fmotion(self):
+        self.motion_after = None
+        x = self.canvas.canvasx(self.motion_xy[0])
+        y = self.canvas.canvasy(self.motion_xy[1])
+        # continuous layout: maybe another page than the current one
+        pno = self.fpage_at(y)
+        if pno == self.current_page:
+            grid, imat = self.link_grid, self.page_imat
+        else:
+            grid, imat = self.fhover(pno)
+        p = fitz.Point(x, y) * imat
+        item = grid.ffind(p.x, p.y)
+        # if goto type
+        if item is not None and item[0] == 1:
+            ll = "Go to page: "+str(item[2]+1)
+            self.label_link_var.set(ll)
+        elif item is not None and item[0] == 2:
+            ll = "External Link: "+item[2]
+            self.label_link_var.set(ll)
+        # 
+        elif grid.cells:
+            # reset the label
+            self.label_link_var.set("")
     
     # set the canvas binds and cursor
     def fannot(self, atype):
         # if a searching has been performed no annots
         if self.dsearch == 1:
             return
-        # only if the page has not been rotated
-        if abs(self.rotation) == 0:
-            # text (pop up style)
-            if atype == 0:
-                ## unbind functions - canvas bind: LMB
-                self.canvas.unbind("<Button-1>", self.bind_id_1)
-                self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
-                self.canvas.unbind("<Button-3>", self.bind_id_3)
-                ## new binds
-                self.bind_id_1 = self.canvas.bind("<Button-1>", lambda event,a=atype: self.fannotf(event, a))
-                self.bind_id_2 = self.canvas.bind("<Button1-ButtonRelease>", self.fannotff1)
-                # RMB to invalid the choise
-                self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff1)
-                # change the cursor
-                self.master.config(cursor='clock red red')
-            # rect annot
-            elif atype == 4 or atype == 2:
-                ## unbind functions
-                self.canvas.unbind("<Button-1>", self.bind_id_1)
-                self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
-                self.canvas.unbind("<Button-3>", self.bind_id_3)
-                ## new binds
-                # a point is added
-                self.bind_id_2 = self.canvas.bind("<Button1-ButtonRelease>", lambda event,x=atype:self.fannot_p(event, x))
-                # RMB to invalid the choise
-                self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff2)
-                # change the cursor
-                self.master.config(cursor='clock red red')
-            # highlight annot
-            elif atype == 8:
-                ## unbind functions
-                self.canvas.unbind("<Button-1>", self.bind_id_1)
-                self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
-                self.canvas.unbind("<Button-3>", self.bind_id_3)
-                ## new binds
-                self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff3)
-                # change the cursor
-                self.master.config(cursor='clock red red')
-                # if 1 the use of the clipboard is disabled
-                # the function getText will not save the selection
-                # to clipboard, it will call fannotfe instead
-                self.annot_hl = 1
-                
+        # text (pop up style)
+        if atype == 0:
+            ## unbind functions - canvas bind: LMB
+            self.canvas.unbind("<Button-1>", self.bind_id_1)
+            self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
+            self.canvas.unbind("<Button-3>", self.bind_id_3)
+            ## new binds
+            self.bind_id_1 = self.canvas.bind("<Button-1>", lambda event,a=atype: self.fannotf(event, a))
+            self.bind_id_2 = self.canvas.bind("<Button1-ButtonRelease>", self.fannotff1)
+            # RMB to invalid the choise
+            self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff1)
+            # change the cursor
+            self.master.config(cursor='clock red red')
+        # rect annot
+        elif atype == 4 or atype == 2:
+            ## unbind functions
+            self.canvas.unbind("<Button-1>", self.bind_id_1)
+            self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
+            self.canvas.unbind("<Button-3>", self.bind_id_3)
+            ## new binds
+            # a point is added
+            self.bind_id_2 = self.canvas.bind("<Button1-ButtonRelease>", lambda event,x=atype:self.fannot_p(event, x))
+            # RMB to invalid the choise
+            self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff2)
+            # change the cursor
+            self.master.config(cursor='clock red red')
+        # highlight annot
+        elif atype == 8:
+            ## unbind functions
+            self.canvas.unbind("<Button-1>", self.bind_id_1)
+            self.canvas.unbind("<Button1-ButtonRelease>", self.bind_id_2)
+            self.canvas.unbind("<Button-3>", self.bind_id_3)
+            ## new binds
+            self.bind_id_3 = self.canvas.bind("<Button-3>", self.fannotff3)
+            # change the cursor
+            self.master.config(cursor='clock red red')
+            # if 1 the use of the clipboard is disabled
+            # the function getText will not save the selection
+            # to clipboard, it will call fannotfe instead
+            self.annot_hl = 1
+            
         
     # add annot type 0
     def fannotf(self, event, atype):
         if atype == 0:
-            cx = self.canvas.canvasx(event.x)/self.zoom
-            cy = self.canvas.canvasy(event.y)/self.zoom
+            y = self.canvas.canvasy(event.y)
+            self.fpage_under(y)
+            cx, cy = self.fpage_point(self.canvas.canvasx(event.x), y)
             #
             d = MyDialogAnnot(self.master)
             self.master.wait_window(d.top)
             if d.ttext != "-1":
-                rect = fitz.Rect(int(cx), int(cy), int(cx)+50, int(cy)+50)
-                #
-                try:
-                    info = {'content': '', 'name': '', 'title': '', 'creationDate': '', 'modDate': '', 'subject': ''}
-                    info['name'] = d.ttext[0]
-                    info['content'] = d.ttext[1]
-                    info['title'] = d.ttext[2]
-                    info['creationDate'] = d.ttext[3]
-                    info['modDate'] = d.ttext[4]
-                    info['subject'] = d.ttext[5]
-                    annot = self.page.addTextAnnot(rect.tl, "")
-                    annot.setInfo(info)
-                    annot.update()
-                except Exception as E:
-                    messagebox.showerror("Error", str(E))
-                    return
-            else:
-                return
-        
-        ### save and reload the doc
-        try:
-            #
-            try:
-                self.doc.save(filename=self.filename, incremental=True)
-                messagebox.showinfo("Saved", "The pdf\n"+os.path.basename(self.filename)+"\nhas been saved.")
-            except Exception as E:
-                messagebox.showerror("Error", str(E))
-            # empty the list
-            self.annot_list = []
-            ## document reloaded
-            # current page to reload
-            current_page = self.current_page
-            # empty canvas
-            self.fdelete()
-            # reload the doc
-            self.getDoc(self.filename)
-            # set the page
-            self.page = self.doc.loadPage(current_page)
-            self.current_page = current_page
-        except Exception as E:
-            messagebox.showerror("Error", str(E))
-            return
+                # the view may have been scrolled meanwhile
+                self.fpage_under(y)
+                rect = [int(cx), int(cy), int(cx)+50, int(cy)+50]
+                self.fannot_new(atype, rect, self.finfo(d.ttext))
 
     # LMB is clicked to collect points
     def fannot_p(self, event, atype):
         
-        cx = self.canvas.canvasx(event.x)/self.zoom
-        cy = self.canvas.canvasy(event.y)/self.zoom
+        y = self.canvas.canvasy(event.y)
+        # both points in the page of the first one
+        if not self.annot_points:
+            self.fpage_under(y)
+        cx, cy = self.fpage_point(self.canvas.canvasx(event.x), y)
         #
         # in the list
         self.annot_points.append(cx)
@@ -586,103 +744,15 @@ class Application(ttk.Frame):
         # restore the cursor
         self.master.config(cursor='')
         
-        # rect type
-        if atype == 4:
-            # draw the annot rect
-            try:
-                rect = fitz.Rect(self.annot_points[0],self.annot_points[1],self.annot_points[2],self.annot_points[3])
-                annot = self.page.addRectAnnot(rect)
-                blue   = (0, 0, 1)
-                border = {"width": 4.0, "dashes": [1]}
-                annot.setBorder(border)
-                colors = {"stroke": blue, "fill": ''}
-                annot.setColors(colors)
-                annot.setLineEnds(fitz.ANNOT_LE_ClosedArrow, fitz.ANNOT_LE_RClosedArrow)
-                # reset the list
-                self.annot_points = []
-                
-                ## the info
-                d = MyDialogAnnot(self.master)
-                self.master.wait_window(d.top)
-                if d.ttext != "-1":
-                    #
-                    info = {'content': '', 'name': '', 'title': '', 'creationDate': '', 'modDate': '', 'subject': ''}
-                    info['name'] = d.ttext[0]
-                    info['content'] = d.ttext[1]
-                    info['title'] = d.ttext[2]
-                    info['creationDate'] = d.ttext[3]
-                    info['modDate'] = d.ttext[4]
-                    info['subject'] = d.ttext[5]
-                    #
-                    annot.setInfo(info)
-                    #
-                    annot.update()
-                else:
-                    return
-            except Exception as E:
-                messagebox.showerror("Error", str(E))
-                return
-        # freetext type
-        elif atype == 2:
-            # draw the annot
-            try:
-                rect = fitz.Rect(self.annot_points[0],self.annot_points[1],self.annot_points[2],self.annot_points[3])
-                
-                annot = self.page.addFreetextAnnot(rect, "")
-                red    = (1, 0, 0)
-                blue   = (0, 0, 1)
-                gold   = (1, 1, 0)
-                border = {"width": 1.0}
-                annot.setBorder(border)
-
-                # reset the list
-                self.annot_points = []
-                
-                ## the info
-                d = MyDialogAnnot(self.master)
-                self.master.wait_window(d.top)
-                if d.ttext != "-1":
-                    #
-                    info = {'content': '', 'name': '', 'title': '', 'creationDate': '', 'modDate': '', 'subject': ''}
-                    info['name'] = d.ttext[0]
-                    info['content'] = d.ttext[1]
-                    info['title'] = d.ttext[2]
-                    info['creationDate'] = d.ttext[3]
-                    info['modDate'] = d.ttext[4]
-                    info['subject'] = d.ttext[5]
-                    #
-                    annot.setInfo(info)
-                    #
-                    annot.update(fontsize = 10, border_color=red, fill_color=gold, text_color=blue)
-                else:
-                    return
-            except Exception as E:
-                messagebox.showerror("Error", str(E))
-                return
-        
-        ### save and reload the doc
-        try:
-            #
-            try:
-                self.doc.save(filename=self.filename, incremental=True)
-                messagebox.showinfo("Saved", "The pdf\n"+os.path.basename(self.filename)+"\nhas been saved.")
-            except Exception as E:
-                messagebox.showerror("Error", str(E))
-            # empty the lista
-            self.annot_list = []
-            ## document reloaded
-            # current page to reload
-            current_page = self.current_page
-            # empty canvas
-            self.fdelete()
-            # reload the doc
-            self.getDoc(self.filename)
-            # set the page
-            self.page = self.doc.loadPage(current_page)
-            self.current_page = current_page
-        except Exception as E:
-            messagebox.showerror("Error", str(E))
-            return
+        rect = list(self.annot_points)
+        # reset the list
+        self.annot_points = []
+        ## the info
+        d = MyDialogAnnot(self.master)
+        self.master.wait_window(d.top)
+        if d.ttext != "-1":
+            # rect type (4) or freetext type (2)
+            self.fannot_new(atype, rect, self.finfo(d.ttext))
    
     # add annot type 8 - CTRL+LMB
     def fannotfe(self):
@@ -693,53 +763,166 @@ class Application(ttk.Frame):
         # reset
         self.selected_coords = None
         
-        try:
-            # add the info
-            d = MyDialogAnnot(self.master)
-            self.master.wait_window(d.top)
-            if d.ttext != "-1":
-                #
-                info = {'content': '', 'name': '', 'title': '', 'creationDate': '', 'modDate': '', 'subject': ''}
-                info['name'] = d.ttext[0]
-                info['content'] = d.ttext[1]
-                info['title'] = d.ttext[2]
-                info['creationDate'] = d.ttext[3]
-                info['modDate'] = d.ttext[4]
-                info['subject'] = d.ttext[5]
-                
-                annot = self.page.addHighlightAnnot(coords)
-                annot.setInfo(info)
-                annot.update()
-            else:
-                return
-        except Exception as E:
-            messagebox.showerror("Error", str(E))
-            return
+        # add the info
+        d = MyDialogAnnot(self.master)
+        self.master.wait_window(d.top)
         # restore the binds and pointer
         self.fannotff3(event=None)
-        ### save and reload the doc
-        try:
-            #
-            try:
-                self.doc.save(filename=self.filename, incremental=True)
-                messagebox.showinfo("Saved", "The pdf\n"+os.path.basename(self.filename)+"\nhas been saved.")
-            except Exception as E:
-                messagebox.showerror("Error", str(E))
-            # empty the lista
-            self.annot_list = []
-            ## document reloaded
-            # current page to reload
-            current_page = self.current_page
+        if d.ttext != "-1":
+            self.fannot_new(8, list(coords), self.finfo(d.ttext))
+    
+    # the info of the dialog MyDialogAnnot
+    def finfo(self, ttext):
+        info = {'content': '', 'name': '', 'title': '', 'creationDate': '', 'modDate': '', 'subject': ''}
+        info['name'] = ttext[0]
+        info['content'] = ttext[1]
+        info['title'] = ttext[2]
+        info['creationDate'] = ttext[3]
+        info['modDate'] = ttext[4]
+        info['subject'] = ttext[5]
+        return info
+    
+    # add an annotation of type atype to the page
+    # type 0: text - 2: freetext - 4: rectangle - 8: highlight
+    def fannot_add(self, page, atype, rect, info):
+        if atype == 0:
+            annot = page.addTextAnnot(rect.tl, "")
+            annot.setInfo(info)
+            annot.update()
+        elif atype == 4:
+            annot = page.addRectAnnot(rect)
+            blue   = (0, 0, 1)
+            border = {"width": 4.0, "dashes": [1]}
+            annot.setBorder(border)
+            colors = {"stroke": blue, "fill": ''}
+            annot.setColors(colors)
+            annot.setLineEnds(fitz.ANNOT_LE_ClosedArrow, fitz.ANNOT_LE_RClosedArrow)
+            annot.setInfo(info)
+            annot.update()
+        elif atype == 2:
+            annot = page.addFreetextAnnot(rect, "")
+            red    = (1, 0, 0)
+            blue   = (0, 0, 1)
+            gold   = (1, 1, 0)
+            border = {"width": 1.0}
+            annot.setBorder(border)
+            annot.setInfo(info)
+            annot.update(fontsize = 10, border_color=red, fill_color=gold, text_color=blue)
+        elif atype == 8:
+            annot = page.addHighlightAnnot(rect)
+            annot.setInfo(info)
+            annot.update()
+        return annot
+    
+    # make a change in the annotations of the page
+    # add: type, rect and info - delete: xref (type, rect and info to undo it)
+    # return the area changed
+    def fannot_apply(self, page, op):
+        if op["op"] == "add":
+            annot = self.fannot_add(page, op["type"], fitz.Rect(op["rect"]), op["info"])
+            # needed to delete it
+            op["xref"] = annot.xref
+            return annot.rect
+        annot = self.fannot_index(page).annots.get(op["xref"])
+        if annot is None:
+            raise ValueError("Annotation not found")
+        rect = annot.rect
+        page.deleteAnnot(annot)
+        return rect
+    
+    # make a change in the current document and write it in the journal
+    # return True if done
+    def fannot_do(self, op):
+        # the change is shown
+        if op["page"] != self.current_page:
             # empty canvas
             self.fdelete()
-            # reload the doc
-            self.getDoc(self.filename)
             # set the page
-            self.page = self.doc.loadPage(current_page)
-            self.current_page = current_page
+            self.current_page = op["page"]
+            self.page = self.doc.loadPage(self.current_page)
+            #
+            self.fcanvas()
+        try:
+            rect = self.fannot_apply(self.page, op)
         except Exception as E:
             messagebox.showerror("Error", str(E))
+            return False
+        try:
+            self.journal.fappend(op)
+        except Exception as E:
+            messagebox.showerror("Error", str(E))
+        # the page has changed
+        self.fannot_changed(rect)
+        return True
+    
+    # a new annotation by the user
+    def fannot_new(self, atype, rect, info):
+        op = {"op": "add", "page": self.current_page, "type": atype, "rect": rect, "info": info}
+        if self.fannot_do(op):
+            self.undo_ops.append(op)
+            self.redo_ops = []
+    
+    # the opposite change
+    def finverse(self, op):
+        inv = dict(op)
+        if op["op"] == "add":
+            inv["op"] = "delete"
+        else:
+            inv["op"] = "add"
+        return inv
+    
+    # Ctrl+Z and Ctrl+Y are for the document only in the main window,
+    # not in a dialog or while typing in an entry
+    def fedit_key(self, event):
+        if event is None:
+            return True
+        widget = event.widget
+        if not isinstance(widget, tk.Misc) or isinstance(widget, (tk.Entry, tk.Text)):
+            return False
+        return widget.winfo_toplevel() == self.winfo_toplevel()
+    
+    # undo the last change of the annotations - Ctrl+Z
+    def fundo(self, event=None):
+        if self.doc is None or not self.undo_ops or not self.fedit_key(event):
+            return
+        op = self.undo_ops.pop()
+        inv = self.finverse(op)
+        if self.fannot_do(inv):
+            # the annotation added again has a new xref
+            if op["op"] == "delete":
+                op["xref"] = inv["xref"]
+            self.redo_ops.append(op)
+    
+    # redo the last change undone - Ctrl+Y
+    def fredo(self, event=None):
+        if self.doc is None or not self.redo_ops or not self.fedit_key(event):
             return
+        op = self.redo_ops.pop()
+        if self.fannot_do(op):
+            self.undo_ops.append(op)
+    
+    # the changes of a session closed without saving them
+    # return the pages changed again
+    def freplay(self):
+        pages = set()
+        ops = self.journal.fpending()
+        if ops and messagebox.askyesno("Recovery", "{} changes of the annotations have not been saved in\n{}\nApply them again?".format(len(ops), os.path.basename(self.doc.name))):
+            # the journal gets only the changes applied this time:
+            # they are not replayed twice at the next opening
+            self.journal.fcommit()
+            for op in ops:
+                try:
+                    self.fannot_apply(self.doc.loadPage(op["page"]), op)
+                except Exception:
+                    continue
+                self.render_cache.finvalidate(op["page"])
+                self.dirty_pages.add(op["page"])
+                self.journal.fappend(op)
+                pages.add(op["page"])
+            self.save_after = self.after(annot_save_delay, self.fsave_flush)
+        else:
+            self.journal.fcommit()
+        return pages
     
     # restore the default canvas binds and cursor for type 0
     def fannotff1(self, event):
@@ -787,13 +970,18 @@ class Application(ttk.Frame):
     
     # restore the widgets and the variable after a searching
     def fstateRestore(self):
+        # stop the searching in background
+        self.fsearch_cancel()
         self.label_link.grid(column=1, row=3, sticky="w")
         self.p_btn.grid_forget()
-        self.f_btn.grid_forget()
+        self.nav_frame.grid_forget()
         # searching done - needed to restore the widgets
         self.dsearch = 0
         # list of areas
         self.areas_list = []
+        self.hit_pages = []
+        self.hit_before = []
+        self.hit_total = 0
     
     
     # RMB on annotations
@@ -808,102 +996,140 @@ class Application(ttk.Frame):
         # clicked on an annot in the page
         cx = self.canvas.canvasx(event.x)
         cy = self.canvas.canvasy(event.y)
-        for item in self.annot_list:
-            if item[0][0] in [0,2,3,4,5,6,7,8,9,10,11,12,14]:
-                if item[2].x0 < cx/self.zoom < item[2].x1:
-                    if item[2].y0 < cy/self.zoom < item[2].y1:
-                        # this menu for deleting annot
-                        menu = tk.Menu(self.master, tearoff=0, font=("", font_size))
-                        menu.add_command(label="Delete", command=lambda :self.fcmd1(cx, cy))
-                        # display the menu
-                        menu.tk_popup(event.x_root+5, event.y_root+5)
-                        break
-            # attachment annot - save the file
-            elif item[0][0] == 16:
-                # this menu for deleting annot
-                menu = tk.Menu(self.master, tearoff=0, font=("", font_size))
-                menu.add_command(label="Delete", command=lambda :self.fcmd1(cx, cy))
-                menu.add_command(label="Save", command=lambda: self.fsave(item[2]))
-                # display the menu
-                menu.post(event.x_root+5, event.y_root+5)
-                break
+        self.fpage_under(cy)
+        px, py = self.fpage_point(cx, cy)
+        item = self.fannot_index().ffind(px, py, [0,2,3,4,5,6,7,8,9,10,11,12,14,16])
+        if item is None:
+            return
+        # this menu for deleting annot
+        menu = tk.Menu(self.master, tearoff=0, font=("", font_size))
+        menu.add_command(label="Delete", command=lambda :self.fcmd1(cx, cy))
+        # attachment annot - save the file
+        if item[0][0] == 16:
+            menu.add_command(label="Save", command=lambda: self.fsave(item[3]))
+        # display the menu
+        menu.tk_popup(event.x_root+5, event.y_root+5)
               
     # save the attached file
-    def fsave(self, item):
+    def fsave(self, xref):
         # find the annot
-        annot = self.page.firstAnnot
-        for iitem in self.annot_list:
-            if iitem[2] == item:
-                info = annot.info
-                try:
-                    buff = annot.fileGet()
-                    fout = open(info["content"], "wb")
-                    fout.write(buff)
-                    fout.close()
-                except Exception as E:
-                    messagebox.showerror("Error", str(E))
-                    return
-                break
-            else:
-                annot = annot.next
+        annot = self.fannot_index().annots.get(xref)
+        if annot is None:
+            return
+        info = annot.info
+        try:
+            buff = annot.fileGet()
+            fout = open(info["content"], "wb")
+            fout.write(buff)
+            fout.close()
+        except Exception as E:
+            messagebox.showerror("Error", str(E))
+            return
     
     # delete the selected annotation
     def fcmd1(self, cx, cy):
-        if self.annot_list != []:
-            i = 0
-            # action for any kind of annot in the page
-            for item in self.annot_list:
-                i += 1
-                if item[0][0] in [0,2,3,4,5,6,7,8,9,10,11,12,14,16]:
-                    if item[2].x0 < cx/self.zoom < item[2].x1:
-                        if item[2].y0 < cy/self.zoom < item[2].y1:
-                            annot = self.page.firstAnnot
-                            if i == 1:
-                                ###########
-                                try:
-                                    ## delete this annot
-                                    self.page.deleteAnnot(annot)
-                                    # save the document
-                                    try:
-                                        self.doc.save(filename=self.filename, incremental=True)
-                                        messagebox.showinfo("Saved", "The pdf\n"+os.path.basename(self.filename)+"\nhas been saved.")
-                                    except Exception as E:
-                                        messagebox.showerror("Error", str(E))
-                                except Exception as E:
-                                    messagebox.showerror("Error", str(E))
-                                #########
-                            else:
-                                # range(i-1) because the first annot is mandatory
-                                for ii in range(i-1):
-                                    annot = annot.next
-                                ###########
-                                try:
-                                    ## delete this annot
-                                    self.page.deleteAnnot(annot)
-                                    # save the document
-                                    try:
-                                        self.doc.save(filename=self.filename, incremental=True)
-                                        messagebox.showinfo("Saved", "The pdf\n"+os.path.basename(self.filename)+"\nhas been saved.")
-                                    except Exception as E:
-                                        messagebox.showerror("Error", str(E))
-                                except Exception as E:
-                                    messagebox.showerror("Error", str(E))
-                                #########
-        
-            ## must reparser the annotations
-            # empty the lista
-            self.annot_list = []
-            
-            ### document reloaded
-            # current page to reload
-            current_page = self.current_page
-            # empty canvas
+        self.fpage_under(cy)
+        px, py = self.fpage_point(cx, cy)
+        item = self.fannot_index().ffind(px, py, [0,2,3,4,5,6,7,8,9,10,11,12,14,16])
+        if item is None:
+            return
+        ## delete this annot
+        op = {"op": "delete", "page": self.current_page, "xref": item[3],
+              "type": item[0][0], "rect": list(item[2]), "info": item[1]}
+        if self.fannot_do(op):
+            # only the types of this program can be added again
+            if item[0][0] in [0,2,4,8]:
+                self.undo_ops.append(op)
+            self.redo_ops = []
+    
+    # the annotations of the current page have changed:
+    # the area is rendered again and the file saved later
+    def fannot_changed(self, rect):
+        self.render_cache.finvalidate(self.current_page)
+        if hasattr(self.doc, "dropDisplayLists"):
+            self.doc.dropDisplayLists(self.current_page)
+        # the words include the text of the annotations (freetext)
+        self.words_cache.pop(self.current_page, None)
+        # the workers still have the file without the changes
+        self.dirty_pages.add(self.current_page)
+        if self.prefetch:
+            self.prefetch.fdrop(self.current_page)
+        # must reparser the annotations
+        self.annot_index = None
+        self.fthumb_redo(self.current_page)
+        self.fredraw(rect)
+        # many changes in a row: only one saving
+        if self.save_after is not None:
+            self.after_cancel(self.save_after)
+        self.save_after = self.after(annot_save_delay, self.fsave_flush)
+    
+    # save the changes into the file
+    # reopen: the workers open the file again
+    def fsave_flush(self, reopen=True):
+        if self.save_after is None:
+            return
+        self.after_cancel(self.save_after)
+        self.save_after = None
+        try:
+            self.doc.save(filename=self.doc.name, incremental=True)
+            self.label_link_var.set("Saved: "+os.path.basename(self.doc.name))
+        except Exception as E:
+            messagebox.showerror("Error", str(E))
+            return
+        # the changes are in the file now
+        self.dirty_pages = set()
+        # another file for the disk cache
+        self.file_hash = None
+        self.saves += 1
+        try:
+            self.journal.fcommit()
+        except Exception:
+            pass
+        if reopen:
+            # the file has changed
+            self.fload_buffer()
+            self.fprefetch_start()
+            self.fhash_start()
+            # the next searching opens the file again; a searching
+            # still running keeps its workers until it ends
+            if self.search_jobs:
+                self.search_stale = True
+            else:
+                self.fsearch_drop()
+    
+    # the annotations of the page - read once for each page loaded
+    def fannot_index(self, page=None):
+        if page is None:
+            page = self.page
+        if self.annot_index is not None and self.annot_index.page is page:
+            return self.annot_index
+        index = AnnotIndex(page)
+        if page is self.page:
+            self.annot_index = index
+        return index
+    
+    # render again only the area rect of the current page
+    def fredraw(self, rect):
+        # continuous: only the image of this page again, the view does not move
+        if self.continuous:
+            item = self.shown_pages.pop(self.current_page, None)
+            if item is not None:
+                self.canvas.delete(item[0])
+            self.fvisible()
+            return
+        # the whole page is not in one image
+        if self.tile_key is not None or self.page_rot % 360:
             self.fdelete()
-            # reload the doc
-            self.getDoc(self.filename)
-            # set the page
-            self.page = self.doc.loadPage(current_page)
-            self.current_page = current_page
+            self.fcanvas(rot=self.page_rot)
+            return
+        # also the borders
+        clip = fitz.Rect(rect.x0-5, rect.y0-5, rect.x1+5, rect.y1+5) & self.page.rect
+        if clip.isEmpty:
+            return
+        pix = self.page.getPixmap(matrix=self.mat, colorspace=fitz.csRGB, clip=clip, alpha=USE_ALPHA)
+        patch = tk.PhotoImage(data=fimage_data(pix))
+        # over the page image: the old pixels are replaced
+        self.png1.tk.call(self.png1, "copy", patch, "-to", pix.x, pix.y, "-compositingrule", "set")
     
     # the canvas scrolls at mouse pointer movement
     def cscrolling(self, event):
@@ -913,96 +1139,140 @@ class Application(ttk.Frame):
     def cButtonLeft(self, event):
         # canvas scrolling with LMB
         self.canvas.scan_mark(event.x, event.y)
-        
-        # only if the page has not been rotated
-        if abs(self.rotation) == 0:
-            # go to the selected link if type 1
-            if self.link_selected != 0:
-                new_page = self.link_selected
-                # if can be reached
-                if new_page < self.page_count:
-                    self.fdelete()
-                    # 
-                    self.current_page = new_page
-                    self.page = self.doc.loadPage(self.current_page)
-                    #
-                    self.fcanvas()
-                    # reset the variable
-                    self.link_selected = 0
-            # web link to clipboard
-            if self.weblink_selected != 0:
-                self.clipboard_clear()
-                self.clipboard_append(self.weblink_selected)
-                # reset
-                self.weblink_selected = 0
-            global annot_widg
-            if annot_widg == 0:
-                # in term of canvas position
-                cx = self.canvas.canvasx(event.x)
-                cy = self.canvas.canvasy(event.y)
-
+        # continuous layout: the page clicked
+        self.fpage_under(self.canvas.canvasy(event.y))
+        
+        # the link under the pointer
+        px, py = self.fpage_point(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        item = self.link_grid.ffind(px, py)
+        # go to the selected link if type 1
+        if item is not None and item[0] == 1:
+            new_page = item[2]
+            # if can be reached
+            if 0 <= new_page < self.page_count:
+                self.fdelete()
                 # 
-                # ANNOT
-                # if an annot is found
-                if self.annot_list != []:
-                    # action for any kind of annot in the page
-                    for item in self.annot_list:
-                        #
-                        if item[0][0] in [0,2,3,4,5,6,7,8,9,10,11,12,14]:
-                            if item[2].x0 < cx/self.zoom < item[2].x1:
-                                if item[2].y0 < cy/self.zoom < item[2].y1:
-                                    ww = annotWindow(self.master, item, [self.master.winfo_pointerx()+20, self.master.winfo_pointery()+20])
-                                    #
-                                    annot_widg = 1
-                                    break
+                self.current_page = new_page
+                self.page = self.doc.loadPage(self.current_page)
+                #
+                self.fcanvas()
+        # web link to clipboard
+        elif item is not None and item[0] == 2:
+            self.clipboard_clear()
+            self.clipboard_append(item[2])
+        global annot_widg
+        if annot_widg == 0:
+            # in term of canvas position
+            cx = self.canvas.canvasx(event.x)
+            cy = self.canvas.canvasy(event.y)
+            px, py = self.fpage_point(cx, cy)
+
+            # 
+            # ANNOT
+            # if an annot is found
+            item = self.fannot_index().ffind(px, py, [0,2,3,4,5,6,7,8,9,10,11,12,14])
+            if item is not None:
+                ww = annotWindow(self.master, item, [self.master.winfo_pointerx()+20, self.master.winfo_pointery()+20])
+                #
+                annot_widg = 1
         
     # the outline
+    # only the first level is inserted: the others when opened
     def popToc(self, id):
         # empty the treeview
-        self.list_id = []
         self.tv.delete(*self.tv.get_children())
+        self.toc_pending = {}
+        self.tv_paged = False
+        self.tv_first = 0
         
         # if there is an outline
         if self.toc:
-            #
-            for item in self.toc:
-                #
-                idx = item[0]
-                
-                if idx == 1:
-                    # empty the list
-                    self.list_id = []
-                    id = self.tv.insert("", "end", text=item[1], values=(item[2]))
-                    # add id to the lista
-                    self.list_id.append(id)
-                elif idx > 1:
-                    while len(self.list_id) >= idx:
-                        self.list_id.pop()
-                    # index of the graiter element
-                    if idx > len(self.list_id):
-                        id = self.tv.insert(self.list_id[idx-2], "end", text=item[1], values=(item[2]))
-                        # add id to the list
-                        self.list_id.append(id)
-                    # index of the lesser element
-                    elif idx < len(self.list_id):
-                        # remove the last
-                        self.list_id.pop()
-                        #
-                        id = self.tv.insert(self.list_id[idx-2], "end", text=item[1], values=(item[2]))
-                        # add id to the list
-                        self.list_id.append(id)
+            # the entries below each entry - -1: the first level
+            self.toc_children = {-1: []}
+            parents = []
+            for i, item in enumerate(self.toc):
+                # the last entry of a lower level is the parent
+                while parents and self.toc[parents[-1]][0] >= item[0]:
+                    parents.pop()
+                parent = parents[-1] if parents else -1
+                self.toc_children.setdefault(parent, []).append(i)
+                parents.append(i)
+            self.ftvInsert("", -1)
         else:
-            # fille the treeview with the refs to the pages
-            for n in range(self.page_count):
-                self.tv.insert("", "end", text="Page", values=(n+1))
+            # fill the treeview with the refs to the visible pages
+            # the others while scrolling
+            self.tv_paged = True
+            self.ftvPages()
+    
+    # insert the entries below the entry parent_idx in the item parent
+    def ftvInsert(self, parent, parent_idx):
+        for i in self.toc_children.get(parent_idx, []):
+            item = self.toc[i]
+            id = self.tv.insert(parent, "end", text=item[1], values=(item[2]))
+            # an empty row to show the arrow
+            if i in self.toc_children:
+                self.tv.insert(id, "end", text="")
+                self.toc_pending[id] = i
+    
+    # the refs to the pages in the visible rows:
+    # the rows are the same, only their page changes
+    def ftvPages(self):
+        if not self.tv_paged:
+            return
+        rows = self.ftv_rows()
+        self.tv_first = max(min(self.tv_first, self.page_count - rows), 0)
+        last = min(self.tv_first + rows, self.page_count)
+        # the row selected would show another page
+        if self.tv.selection():
+            self.tv.selection_remove(*self.tv.selection())
+        items = self.tv.get_children()
+        if len(items) > last - self.tv_first:
+            self.tv.delete(*items[last-self.tv_first:])
+        for n in range(len(items), last - self.tv_first):
+            self.tv.insert("", "end", text="Page")
+        for n, item in zip(range(self.tv_first, last), self.tv.get_children()):
+            self.tv.item(item, values=(n+1))
+        self.vscrollbar.set(self.tv_first/self.page_count, last/self.page_count)
+    
+    # the rows visible in the treeview, the heading excluded
+    def ftv_rows(self):
+        return max(self.tv.winfo_height() // (self.tv_row_height+2) - 1, 1)
+    
+    # the scrollbar of the treeview has been moved
+    def ftv_yview(self, *args):
+        if not self.tv_paged:
+            self.tv.yview(*args)
+            return
+        rows = self.ftv_rows()
+        if args[0] == "moveto":
+            self.tv_first = int(float(args[1]) * self.page_count)
+        elif args[2] == "pages":
+            self.tv_first += int(args[1]) * rows
+        else:
+            self.tv_first += int(args[1])
+        self.ftvPages()
+    
+    # the mouse wheel on the list of the pages
+    def ftv_wheel(self, n):
+        if not self.tv_paged:
+            return
+        self.tv_first += n
+        self.ftvPages()
+        # not also the page
+        return "break"
+    
+    # the treeview has been scrolled
+    def ftv_scroll(self, first, last):
+        # the list of the pages sets the scrollbar itself
+        if not self.tv_paged:
+            self.vscrollbar.set(first, last)
              
     # hide the outline
     def fhidetoc(self):
         
         if self.tocHide == 0:
             # remove the widgets
-            self.tv.pack_forget()
-            self.vscrollbar.pack_forget()
+            self.side_nb.pack_forget()
             # add the fake label
             self.fake_lbl.pack()
             self.tocHide = 1
@@ -1010,10 +1280,199 @@ class Application(ttk.Frame):
             # remove the fake label
             self.fake_lbl.pack_forget()
             # add the widgets
-            self.tv.pack(side="left", fill="y", expand=True, anchor="nw")
-            self.vscrollbar.pack(fill="y", expand=True, anchor="nw")
+            self.side_nb.pack(side="left", fill="y", expand=True, anchor="nw")
             self.tocHide = 0
     
+    # the thumbnails are shown
+    def fthumbs_on(self):
+        return self.tocHide == 0 and self.side_nb.select() == str(self.thumb_frame)
+    
+    # the thumbnail panel has been chosen: start the workers
+    def fthumbs_start(self):
+        if not self.fthumbs_on() or self.doc is None:
+            return
+        self.thumb_canvas.configure(scrollregion=(0, 0, self.thumb_w+20, self.page_count*self.thumb_slot))
+        if self.thumb_pool is None:
+            try:
+                self.thumb_pool = fworker_pool(self.doc.name, self.password, thumb_workers, self.doc_buffer)
+            except Exception as E:
+                messagebox.showerror("Error", str(E))
+                return
+            # the thumbnails of a previous session first
+            try:
+                self.thumb_load = self.thumb_pool.submit(fworker_thumbs_load, self.thumb_w)
+            except BrokenProcessPool:
+                self.fthumbs_broken()
+            self.fthumb_poll_later()
+        self.fthumb_current()
+        self.fthumbs_later()
+    
+    # stop the workers and remove the thumbnails
+    def fthumbs_close(self):
+        if self.thumb_pool:
+            fworker_stop(self.thumb_pool)
+        self.thumb_pool = None
+        self.thumb_jobs = {}
+        self.thumb_load = None
+        self.thumb_local = False
+        for pno in list(self.thumbs_shown):
+            self.thumb_canvas.delete(*self.thumbs_shown.pop(pno)[0])
+        self.thumbs = {}
+        self.thumbs_new = False
+        if self.thumb_mark is not None:
+            self.thumb_canvas.delete(self.thumb_mark)
+            self.thumb_mark = None
+    
+    # a worker crashed or could not open the file:
+    # the thumbnails are made here from now on
+    def fthumbs_broken(self):
+        if self.thumb_pool:
+            fworker_stop(self.thumb_pool)
+        self.thumb_pool = None
+        self.thumb_jobs = {}
+        self.thumb_load = None
+        self.thumb_local = True
+        self.fthumbs_later()
+    
+    # the thumbnail panel has been scrolled
+    def fthumb_scroll(self, first, last):
+        self.thumb_sb.set(first, last)
+        self.fthumbs_later()
+    
+    # scroll the thumbnail panel with the mouse wheel
+    def fthumb_wheel(self, n):
+        self.thumb_canvas.yview_scroll(n, "units")
+        # not also the page
+        return "break"
+    
+    # the visible thumbnails once the scrolling stops
+    def fthumbs_later(self):
+        if self.thumb_visible_after is None:
+            self.thumb_visible_after = self.after_idle(self.fthumbs_visible)
+    
+    # only the visible thumbnails are on the canvas:
+    # the others are removed, or requested to the workers
+    def fthumbs_visible(self):
+        self.thumb_visible_after = None
+        if not self.fthumbs_on() or (self.thumb_pool is None and not self.thumb_local):
+            return
+        y0 = self.thumb_canvas.canvasy(0)
+        y1 = y0 + self.thumb_canvas.winfo_height()
+        # also a thumbnail before and after
+        first = max(int(y0//self.thumb_slot)-1, 0)
+        last = min(int(y1//self.thumb_slot)+2, self.page_count)
+        for pno in list(self.thumbs_shown):
+            if not first <= pno < last:
+                self.thumb_canvas.delete(*self.thumbs_shown.pop(pno)[0])
+        # the pages no longer near
+        for pno in list(self.thumb_jobs):
+            if not first <= pno < last:
+                self.thumb_jobs.pop(pno).cancel()
+        for pno in range(first, last):
+            if pno in self.thumbs_shown:
+                continue
+            # the workers still have the file without the changes
+            if (self.thumb_local or pno in self.dirty_pages) and pno not in self.thumbs:
+                self.thumbs[pno] = fthumb_data(self.doc.loadPage(pno), self.thumb_w, self.thumb_h)
+            if pno in self.thumbs:
+                self.fthumb_show(pno)
+            elif pno not in self.thumb_jobs and self.thumb_load is None:
+                try:
+                    self.thumb_jobs[pno] = self.thumb_pool.submit(fworker_thumb, pno, self.thumb_w, self.thumb_h)
+                except BrokenProcessPool:
+                    self.fthumbs_broken()
+                    return
+        self.fthumb_poll_later()
+    
+    # put the thumbnail of the page pno on the canvas
+    def fthumb_show(self, pno):
+        w, h, data = self.thumbs[pno]
+        image = tk.PhotoImage(data=data)
+        x = 10 + (self.thumb_w - w)//2
+        y = pno*self.thumb_slot + 5 + (self.thumb_h - h)//2
+        ids = [self.thumb_canvas.create_image(x, y, image=image, anchor=tk.NW),
+               self.thumb_canvas.create_text(10+self.thumb_w//2, pno*self.thumb_slot+self.thumb_h+15, text=str(pno+1))]
+        self.thumbs_shown[pno] = (ids, image)
+    
+    # the thumbnail of a page changed by the user
+    def fthumb_redo(self, pno):
+        self.thumbs.pop(pno, None)
+        if pno in self.thumbs_shown:
+            self.thumb_canvas.delete(*self.thumbs_shown.pop(pno)[0])
+        if self.thumb_pool is not None or self.thumb_local:
+            # the workers still have the file without the changes
+            self.thumbs[pno] = fthumb_data(self.page, self.thumb_w, self.thumb_h)
+            self.thumbs_new = True
+            self.fthumbs_later()
+    
+    # mark the current page and keep it visible
+    def fthumb_current(self):
+        if not self.fthumbs_on():
+            return
+        y = self.current_page*self.thumb_slot
+        if self.thumb_mark is None:
+            self.thumb_mark = self.thumb_canvas.create_rectangle(3, y+2, self.thumb_w+17, y+self.thumb_h+8, outline="blue", width=2)
+        else:
+            self.thumb_canvas.coords(self.thumb_mark, 3, y+2, self.thumb_w+17, y+self.thumb_h+8)
+        y0 = self.thumb_canvas.canvasy(0)
+        if not y0 <= y <= y0 + self.thumb_canvas.winfo_height() - self.thumb_slot:
+            self.thumb_canvas.yview_moveto(y/(self.page_count*self.thumb_slot))
+    
+    # go to the page of the thumbnail clicked
+    def fthumb_click(self, event):
+        pno = int(self.thumb_canvas.canvasy(event.y)//self.thumb_slot)
+        if 0 <= pno < self.page_count and pno != self.current_page:
+            # empty canvas
+            self.fdelete()
+            # set the page
+            self.current_page = pno
+            self.page = self.doc.loadPage(self.current_page)
+            #
+            self.fcanvas()
+    
+    # look at the workers again in a while
+    def fthumb_poll_later(self):
+        if self.thumb_after is None and (self.thumb_jobs or self.thumb_load is not None):
+            self.thumb_after = self.after(50, self.fthumb_poll)
+    
+    # collect the thumbnails made by the workers
+    def fthumb_poll(self):
+        self.thumb_after = None
+        # the thumbnails of the cache folder
+        if self.thumb_load is not None and self.thumb_load.done():
+            if not self.thumb_load.cancelled() and isinstance(self.thumb_load.exception(), BrokenProcessPool):
+                self.fthumbs_broken()
+                return
+            if not self.thumb_load.cancelled() and self.thumb_load.exception() is None:
+                for pno, data in self.thumb_load.result().items():
+                    # not those changed in the meanwhile
+                    if pno < self.page_count and pno not in self.dirty_pages:
+                        self.thumbs.setdefault(pno, data)
+            self.thumb_load = None
+            self.fthumbs_later()
+        for pno in list(self.thumb_jobs):
+            job = self.thumb_jobs[pno]
+            if job.done():
+                del self.thumb_jobs[pno]
+                if not job.cancelled() and isinstance(job.exception(), BrokenProcessPool):
+                    self.fthumbs_broken()
+                    return
+                if job.cancelled() or job.exception() is not None or pno in self.dirty_pages:
+                    continue
+                self.thumbs[pno] = job.result()
+                self.thumbs_new = True
+                if pno not in self.thumbs_shown and self.fthumbs_on():
+                    self.fthumb_show(pno)
+        if self.thumb_jobs or self.thumb_load is not None:
+            self.fthumb_poll_later()
+        elif self.thumbs_new and self.thumb_pool is not None:
+            # all done: store them for the next time
+            self.thumbs_new = False
+            try:
+                self.thumb_pool.submit(fworker_thumbs_save, self.thumb_w, dict(self.thumbs))
+            except BrokenProcessPool:
+                self.fthumbs_broken()
+    
     # save the doc choosing the folder
     def fsave_doc(self):
         try:
@@ -1074,13 +1533,13 @@ class Application(ttk.Frame):
             # in the page
             if d.ttext[1] == 1: 
                 # got rect
-                areas = self.page.searchFor(d.ttext[0])
+                areas = self.page.searchFor(d.ttext[0], hit_max=search_hit_max)
                 # if no result return
                 if not areas:
                     return
                 #
                 for ar in areas:
-                    id = self.canvas.create_rectangle(ar[0]*self.zoom, ar[1]*self.zoom, ar[2]*self.zoom, ar[3]*self.zoom, width=2)
+                    id = self.canvas.create_rectangle(*self.fcanvas_rect(ar), width=2)
                     self.search_id.append(id)
             # in the whole document
             elif d.ttext[1] == 2:
@@ -1089,37 +1548,139 @@ class Application(ttk.Frame):
                 # list of areas - reset
                 self.areas_list = []
                 # 
-                for p in range(self.page_count):
-                    ppage = self.doc.loadPage(p)
-                    areas = ppage.searchFor(ttext)
-                    self.areas_list.append(areas)
+                if self.search_index is not None:
+                    # the words of the document are already known
+                    self.areas_list = self.search_index.fsearch(ttext)
+                else:
+                    # the pages are searched in background
+                    self.fsearch_start(ttext)
+                    return
                 
-                # check if the list is not empty
-                ii = 0
-                for item in self.areas_list:
-                    if item != []:
-                        ii = 1
+                self.hit_pages = [pno for pno, areas in enumerate(self.areas_list) if areas]
+                self.hit_before = None
                 # if no result return
-                if ii == 0:
+                if not self.hit_pages:
                     return
                 #
                 else:
-                    # needed to restore the widgets later
-                    self.dsearch = 1
-                    # hide the label in the bottom
-                    self.label_link.grid_forget()
-                    # show the buttons 
-                    self.p_btn.grid(row=3, column=1, sticky="w")
-                    self.f_btn.grid(row=3, column=2, sticky="w")
-                    # load the first page available
-                    ii = 0
-                    for item in self.areas_list:
-                        if item != []:
-                            ii = 1
-                            break
-                    
-                    self.pp = 1
-                    self.npSearch("np")
+                    self.fsearch_show()
+    
+    # show the first result and the buttons
+    def fsearch_show(self):
+        # needed to restore the widgets later
+        self.dsearch = 1
+        # hide the label in the bottom
+        self.label_link.grid_forget()
+        # show the buttons 
+        self.p_btn.grid(row=3, column=1, sticky="w")
+        self.nav_frame.grid(row=3, column=2, sticky="w")
+        # load the first page available
+        self.npSearch("np")
+    
+    # search the whole document in background
+    # the results are shown as soon as they are found
+    def fsearch_start(self, ttext):
+        # abort the previous searching
+        self.fsearch_cancel()
+        # the file has been saved during the previous searching
+        if self.search_stale:
+            self.fsearch_drop()
+        if self.search_pool is None:
+            try:
+                self.search_pool = fworker_pool(self.doc.name, self.password, search_workers or os.cpu_count(), self.doc_buffer)
+            except Exception as E:
+                messagebox.showerror("Error", str(E))
+                return
+        self.areas_list = [[] for p in range(self.page_count)]
+        self.hit_pages = []
+        self.hit_before = []
+        self.hit_total = 0
+        # a few pages for each job, shared by the workers
+        self.search_text = ttext
+        for first in range(0, self.page_count, 8):
+            last = min(first+8, self.page_count)
+            job = None
+            if self.search_pool is not None:
+                try:
+                    job = self.search_pool.submit(fworker_search, ttext, first, last, search_hit_max)
+                except BrokenProcessPool:
+                    self.fsearch_drop()
+            # the workers are not usable: the poll searches the pages here
+            if job is None:
+                job = concurrent.futures.Future()
+                job.set_exception(BrokenProcessPool())
+            self.search_ranges[job] = (first, last)
+            self.search_jobs.append(job)
+        # the progress bar
+        self.search_scanned = 0
+        self.search_done = bytearray(self.page_count)
+        self.search_front = 0
+        self.search_pb.configure(maximum=self.page_count, value=0)
+        self.search_frame.grid(row=3, column=2, sticky="e")
+        self.search_after = self.after(50, self.fsearch_poll)
+    
+    # the search workers are not usable: a new pool at the next searching
+    def fsearch_drop(self):
+        if self.search_pool:
+            fworker_stop(self.search_pool)
+            self.search_pool = None
+        self.search_stale = False
+    
+    # search the pages here, as a finished job
+    def fsearch_here(self, ttext, first, last):
+        job = concurrent.futures.Future()
+        job.set_result(fworker_search_doc(self.doc, ttext, first, last, search_hit_max))
+        return job
+    
+    # collect the pages searched in background
+    def fsearch_poll(self):
+        self.search_after = None
+        for job in self.search_jobs[:]:
+            if job.done():
+                self.search_jobs.remove(job)
+                if job.cancelled():
+                    continue
+                if isinstance(job.exception(), BrokenProcessPool):
+                    # a worker crashed: these pages are searched here
+                    self.fsearch_drop()
+                    job = self.fsearch_here(self.search_text, *self.search_ranges[job])
+                elif job.exception() is not None:
+                    continue
+                for pno, areas in job.result():
+                    self.areas_list[pno] = areas
+                    if areas:
+                        bisect.insort(self.hit_pages, pno)
+                        self.hit_before = None
+                    self.search_done[pno] = 1
+                    self.search_scanned += 1
+        self.search_pb.configure(value=self.search_scanned)
+        # the jobs end in any order: the first result is shown
+        # when the pages before it have all been searched
+        front = self.search_front
+        while self.search_front < self.page_count and self.search_done[self.search_front]:
+            self.search_front += 1
+        if self.dsearch == 0 and self.hit_pages and self.hit_pages[0] < self.search_front:
+            self.fsearch_show()
+        elif self.dsearch == 0 and not self.search_jobs and self.hit_pages:
+            self.fsearch_show()
+        elif self.dsearch == 1 and self.hit_before is None:
+            # more results: the counter changes
+            self.fhit_counter()
+        if self.search_jobs:
+            self.search_after = self.after(50, self.fsearch_poll)
+        else:
+            self.search_frame.grid_forget()
+    
+    # stop the searching in background
+    def fsearch_cancel(self):
+        for job in self.search_jobs:
+            job.cancel()
+        self.search_jobs = []
+        self.search_ranges = {}
+        if self.search_after is not None:
+            self.after_cancel(self.search_after)
+            self.search_after = None
+        self.search_frame.grid_forget()
 
     #
     def fpfbtn(self, n):
@@ -1130,76 +1691,92 @@ class Application(ttk.Frame):
             #load the previous page
             self.npSearch("p")
     
-    # a cycle would be better if I could
+    # load the next (n), the previous (p) or the first (np) page with results
     def npSearch(self, p):
-        #
+        if not self.hit_pages:
+            return
         if p == "n":
-            if self.current_page < self.page_count - 1:
-                if len(self.areas_list) > self.pp:
-                    if self.areas_list[self.current_page+self.pp] == []:
-                        self.pp += 1
-                        self.npSearch(p)
-                    else:
-                        self.current_page = self.current_page+self.pp
-                        # empty canvas
-                        self.fdelete()
-                        # set the page 
-                        self.page = self.doc.loadPage(self.current_page)
-                        #
-                        self.fcanvas()
-                        #
-                        self.master.update_idletasks()
-                        self.fpfbtnService()
-                        return
-        # 
+            i = bisect.bisect_right(self.hit_pages, self.current_page)
         elif p == "p":
-            if self.current_page > 0:
-                if self.areas_list[self.current_page - self.pp] == []:
-                    if self.current_page - self.pp > 0:
-                        self.pp -= 1
-                        self.npSearch(p)
-                #
-                else:
-                    self.current_page = self.current_page-self.pp
-                    # empty canvas
-                    self.fdelete()
-                    # set the page 
-                    self.page = self.doc.loadPage(self.current_page)
-                    #
-                    self.fcanvas()
-                    self.master.update_idletasks()
-                    #
-                    self.fpfbtnService()
-                    return
-        
-        elif p == "np":
-            self.current_page = 0
-            if self.areas_list[self.current_page+self.pp-1] == []:
-                self.pp += 1
-                self.npSearch(p)
-            else:
-                self.current_page = self.pp - 1
-                # empty canvas
-                self.fdelete()
-                # set the page 
-                self.page = self.doc.loadPage(self.current_page)
-                #
-                self.fcanvas()
-                #
-                self.master.update_idletasks()
-                # resetto
-                self.pp = 1
-                self.fpfbtnService()
+            i = bisect.bisect_left(self.hit_pages, self.current_page) - 1
+        else:
+            i = 0
+        if i < 0 or i >= len(self.hit_pages):
+            return
+        # empty canvas
+        self.fdelete()
+        # set the page 
+        self.current_page = self.hit_pages[i]
+        self.page = self.doc.loadPage(self.current_page)
+        #
+        self.fcanvas()
+        #
+        self.master.update_idletasks()
+        self.fpfbtnService()
+    
+    # the number of results before each page with results
+    def fhit_count(self):
+        if self.hit_before is None:
+            self.hit_before = []
+            n = 0
+            for pno in self.hit_pages:
+                self.hit_before.append(n)
+                n += len(self.areas_list[pno])
+            self.hit_total = n
+    
+    # the hit counter of the current page
+    # the hit i of the page if given
+    def fhit_counter(self, i=None):
+        self.fhit_count()
+        k = bisect.bisect_left(self.hit_pages, self.current_page)
+        if k == len(self.hit_pages) or self.hit_pages[k] != self.current_page:
+            self.hit_var.set("{} hits".format(self.hit_total))
             return
+        first = self.hit_before[k] + 1
+        if i is not None:
+            self.hit_var.set("hit {} of {}".format(first+i, self.hit_total))
+        else:
+            last = first + len(self.areas_list[self.current_page]) - 1
+            if last == first:
+                self.hit_var.set("hit {} of {}".format(first, self.hit_total))
+            else:
+                self.hit_var.set("hits {}-{} of {}".format(first, last, self.hit_total))
+    
+    # the list of all the results
+    def fresults(self):
+        dialogResults(self.master, self)
+    
+    # show the hit i of the page pno
+    def fgoto_hit(self, pno, i):
+        if pno != self.current_page:
+            # empty canvas
+            self.fdelete()
+            # set the page
+            self.current_page = pno
+            self.page = self.doc.loadPage(self.current_page)
+            #
+            self.fcanvas()
+        self.fpfbtnService()
+        # the selected hit
+        x0, y0, x1, y1 = self.fcanvas_rect(self.areas_list[pno][i])
+        id = self.canvas.create_rectangle(x0, y0, x1, y1, width=3, outline="red")
+        self.search_id.append(id)
+        self.fhit_counter(i)
+        # scroll to it
+        sr_height = float(self.canvas.cget("scrollregion").split()[3])
+        self.canvas.yview_moveto(max(y0-self.canvas.winfo_height()/3, 0)/sr_height)
     
     # service function for the fpfbtn function
     def fpfbtnService(self):
         # reset
+        for id in self.search_id:
+            self.canvas.delete(id)
         self.search_id = []
         # draw a rectangle around each areas of the page
         for ar in self.areas_list[self.current_page]:
-            id = self.canvas.create_rectangle(ar[0]*self.zoom, ar[1]*self.zoom, ar[2]*self.zoom, ar[3]*self.zoom, width=2)
+            id = self.canvas.create_rectangle(*self.fcanvas_rect(ar), width=2)
             self.search_id.append(id)
+        self.fhit_counter()
     
     
     # element selected in treeview
@@ -1220,6 +1797,11 @@ class Application(ttk.Frame):
     
     # open the iten in the treeview by clicking on its arrow
     def ftvOpen(self, event):
+        # the entries below it
+        item = self.tv.focus()
+        if item in self.toc_pending:
+            self.tv.delete(*self.tv.get_children(item))
+            self.ftvInsert(item, self.toc_pending.pop(item))
         # disable the treeview bind temporarily
         self.ftvbind()
     
@@ -1249,7 +1831,19 @@ class Application(ttk.Frame):
         self.fcanvas()
     
     # load the file
+    # the first page is shown as soon as possible:
+    # the rest is done later, in idle time
     def getDoc(self, filename):
+        # time to the first page
+        t0 = time.perf_counter()
+        # the later stages of the previous document
+        if self.open_after is not None:
+            self.after_cancel(self.open_after)
+            self.open_after = None
+        # a page of the previous document still to show
+        if self.show_after is not None:
+            self.after_cancel(self.show_after)
+            self.show_after = None
         # load the file
         try:
             ndoc = fitz.open(filename, filetype="pdf")
@@ -1263,7 +1857,10 @@ class Application(ttk.Frame):
         
         # close the old doc
         if self.doc:
+            # the annotations not yet saved
+            self.fsave_flush(reopen=False)
             self.doc.close()
+            self.doc = None
         
         # if a password is required
         if ndoc.isEncrypted:
@@ -1272,91 +1869,245 @@ class Application(ttk.Frame):
            if d.string != "-1":
                try:
                    ndoc.authenticate(d.string)
+                   self.password = d.string
                except Exception as E:
                    messagebox.showerror("Error", str(E))
                    sys.exit()
            else:
                sys.exit()
+           # check if the file is still passworded
+           if ndoc.isEncrypted:
+               messagebox.showerror("Error", "Wrong password")
+               ndoc.close()
+               self.getDoc(filename)
+               return
+           # the time of the dialog is not counted
+           t0 = time.perf_counter()
         
         # the doc
         self.doc = ndoc
+        # rendering, searching and text of a page share one interpretation
+        # only with the fitz of this program
+        if hasattr(self.doc, "getDisplayListCache"):
+            self.doc.getDisplayListCache()
         # amount of pages
         self.page_count = len(self.doc)
         
-        # get the outline - check if the file is still passworded
-        try:
-            # toc - outline
-            self.toc = self.doc.getToC()
-        except:
-            messagebox.showerror("Error", "Wrong password")
-            self.getDoc(filename)
+        # the layout of the previous document
+        for pno in list(self.shown_pages):
+            self.canvas.delete(self.shown_pages.pop(pno)[0])
+        self.page_sizes = []
+        self.layout_key = None
+        self.hover_key = None
+        
+        # the words of the previous document
+        self.words_cache = {}
+        
+        # the cached pages belong to the previous document: the same
+        # file may have been changed since, the keys do not tell it
+        self.render_cache.fclear()
+        
+        # the background tasks of the previous document
+        self.fbackground_close()
+        self.fsearch_cancel()
+        self.fsearch_drop()
+        if self.prefetch:
+            self.prefetch.fclose()
+            self.prefetch = None
+        self.link_map = None
+        self.search_index = None
+        self.doc_buffer = None
+        self.file_hash = None
+        self.fthumbs_close()
+        
+        # the outline is read later
+        self.toc = None
+        self.tv_paged = False
+        self.tv_first = 0
+        self.tv.delete(*self.tv.get_children())
+        self.toc_pending = {}
+        self.embed_btn.grid_forget()
         
         # reset the zoom
         self.zoom = starting_zoom
         
+        # the changes of the annotations
+        self.undo_ops = []
+        self.redo_ops = []
+        self.dirty_pages = set()
+        # the changes not saved are asked after the first page
+        self.journal = None
+        try:
+            self.journal = Journal(filename)
+        except Exception as E:
+            messagebox.showerror("Error", str(E))
+        
         # load the first page
         self.page = self.doc.loadPage(0)
         self.current_page = 0
         
-        # load the outline
-        self.popToc("")
-        
         ### THE ANNOTATIONS
-        # get them
-        annot = self.page.firstAnnot
-        #
-        i = 1
-        while annot:
-            # get the data
-            list = [annot.type, annot.info, annot.rect]
-            # fill the list
-            self.annot_list.append(list)
-            
-            annot = annot.next
-            i += 1
-        # 
-        ######## embeded files
+        # read at the first click on the page
+        self.annot_index = None
+        # the rest: the continuous layout reads the size
+        # of the pages later
+        self.open_stages = [self.fopen_replay, self.fopen_toc, self.fopen_embedded, self.fopen_workers]
+        if self.continuous:
+            self.open_stages.insert(1, self.fopen_sizes)
+        # fill canvas
+        self.fcanvas()
+        # on screen
+        self.master.update_idletasks()
+        ttfp = (time.perf_counter() - t0) * 1000
+        self.label_link_var.set("{}: first page in {:.0f} ms".format(os.path.basename(filename), ttfp))
+        if print_stats:
+            print("Time to first page: {:.1f} ms".format(ttfp))
+        self.open_after = self.after_idle(self.fopen_next)
+    
+    # the next stage of the opening of the document
+    def fopen_next(self):
+        self.open_after = None
+        if self.open_stages:
+            self.open_stages.pop(0)()
+        if self.open_stages:
+            self.open_after = self.after_idle(self.fopen_next)
+    
+    # apply again the changes not saved, if the user wants
+    def fopen_replay(self):
+        if self.journal is None:
+            return
+        try:
+            pages = self.freplay()
+        except Exception as E:
+            messagebox.showerror("Error", str(E))
+            return
+        if not pages:
+            return
+        # the pages on screen do not have the changes
+        for pno in pages:
+            if hasattr(self.doc, "dropDisplayLists"):
+                self.doc.dropDisplayLists(pno)
+            self.words_cache.pop(pno, None)
+        self.annot_index = None
+        if self.continuous:
+            for pno in list(self.shown_pages):
+                self.canvas.delete(self.shown_pages.pop(pno)[0])
+            self.fcurrent(self.current_page)
+            self.fvisible()
+        else:
+            self.fschedule(self.page_rot)
+    
+    # the size of each page for the continuous layout
+    def fopen_sizes(self):
+        sizes = []
+        for n in range(self.page_count):
+            rect = self.doc.loadPage(n).rect
+            sizes.append((rect.width, rect.height))
+        if sizes == self.page_sizes:
+            return
+        self.page_sizes = sizes
+        # the layout made with the size of the first page
+        if self.continuous and self.layout_key is not None:
+            self.layout_key = None
+            self.hover_key = None
+            self.fcanvas(rot=self.page_rot)
+    
+    # get the outline and load it
+    def fopen_toc(self):
+        try:
+            # toc - outline
+            self.toc = self.doc.getToC()
+        except Exception:
+            self.toc = []
+        self.popToc("")
+    
+    ######## embeded files
+    def fopen_embedded(self):
         count = self.doc.embeddedFileCount()
         # add the button to the toolbar if any file has been embedded
         if count:
-            self.embed_btn.grid(column=14, row=0, sticky="w")
+            self.embed_btn.grid(column=15, row=0, sticky="w")
         else:
             self.embed_btn.grid_forget()
-        # fill canvas
-        self.fcanvas()
-        
+    
+    # the worker processes of the document
+    def fopen_workers(self):
+        self.fload_buffer()
+        # the worker for the next and previous pages
+        self.fprefetch_start()
+        if self.prefetch and not self.continuous and self.tile_key is None:
+            self.fprefetch_request(self.page_rot)
+        try:
+            self.bg_pool = fworker_pool(self.doc.name, self.password, buffer=self.doc_buffer)
+        except Exception:
+            self.bg_pool = None
+        # the key of the disk cache
+        self.fhash_start()
+        # the links of all the pages: from the cache folder or read
+        self.fbackground(fworker_links, self.fset_links)
+        # the search index: from the cache folder or built
+        self.fbackground(fworker_index, self.fset_index)
+        # the thumbnails, if shown
+        self.fthumbs_start()
+    # from the current page to canvas coords: zoom, rotation and where the page is
+    # the links, annotations and selections use the same matrix as the image
+    def fset_matrix(self):
+        rect = self.page.rect * self.mat
+        self.page_mat = self.mat * fitz.Matrix(1, 0, 0, 1, self.page_x0 - rect.x0, self.page_y0 - rect.y0)
+        self.page_imat = ~self.page_mat
+    
+    # from canvas coords to a point in the current page
+    def fpage_point(self, cx, cy):
+        p = fitz.Point(cx, cy) * self.page_imat
+        return p.x, p.y
+    
+    # from a rect in the current page to canvas coords
+    def fcanvas_rect(self, rect):
+        r = fitz.Rect(rect) * self.page_mat
+        return r.x0, r.y0, r.x1, r.y1
+    
     # draw a rectangle around each link
     def fshow_links(self):
         # list of list of rectanle and type and page or uri
         self.rect_link_list = []
-        for item in self.link_list:
-            # if GOTO
-            if item["kind"] == 1:
-                rect = item["from"]
-                
-                self.rect_link_list.append([1, rect, item["page"]])
-                
-                x0 = rect.x0*self.zoom
-                y0 = rect.y0*self.zoom
-                x1 = rect.x1*self.zoom
-                y1 = rect.y1*self.zoom
-                
+        self.link_grid = RectGrid()
+        for ltype, rect, target in self.link_list:
+            rect = fitz.Rect(rect)
+            self.rect_link_list.append([ltype, rect, target])
+            self.link_grid.fadd(rect, self.rect_link_list[-1])
+            x0, y0, x1, y1 = self.fcanvas_rect(rect)
+            # blue if GOTO - green if URI
+            if ltype == 1:
                 id = self.canvas.create_rectangle(x0,y0,x1,y1, outline="blue", width=2)
-                self.canvas_list.append(id)
-            # if URI
-            elif item["kind"] == 2:
-                
-                rect = item["from"]
-                
-                self.rect_link_list.append([2, rect, item["uri"]])
-                
-                x0 = rect.x0*self.zoom
-                y0 = rect.y0*self.zoom
-                x1 = rect.x1*self.zoom
-                y1 = rect.y1*self.zoom
-                
+            else:
                 id = self.canvas.create_rectangle(x0,y0,x1,y1, outline="green", width=2)
-                self.canvas_list.append(id)
+            self.canvas_list.append(id)
+    
+    # the pages with links to the current page
+    def fbacklinks(self, event=None):
+        if self.doc is None:
+            return
+        if self.link_map is None:
+            messagebox.showinfo("Links", "The links of the document are still being read.")
+            return
+        dialogBacklinks(self.master, self)
+    
+    # show the link k of the page pno
+    def fgoto_link(self, pno, k):
+        if pno != self.current_page:
+            # empty canvas
+            self.fdelete()
+            # set the page
+            self.current_page = pno
+            self.page = self.doc.loadPage(self.current_page)
+            #
+            self.fcanvas()
+        x0, y0, x1, y1 = self.fcanvas_rect(self.link_map.page_links[pno][k][1])
+        id = self.canvas.create_rectangle(x0, y0, x1, y1, width=3, outline="red")
+        self.canvas_list.append(id)
+        # scroll to it
+        sr_height = float(self.canvas.cget("scrollregion").split()[3])
+        self.canvas.yview_moveto(max(y0-self.canvas.winfo_height()/3, 0)/sr_height)
     
     # save the embedded file
     def fembed(self):
@@ -1370,36 +2121,510 @@ class Application(ttk.Frame):
     def fcanvas(self, rot=0):
         # the current page
         self.page_var.set("Page: {}/{}".format(self.current_page+1, self.page_count))
+        self.fthumb_current()
         self.zoom_lbl.configure(text="Zoom: "+str(self.zoom))
         
         # zoom - default 2
         self.mat = fitz.Matrix(self.zoom, self.zoom)
         # rotation of 90 degrees to right, -90 to left
         self.mat.preRotate(rot)
+        self.page_rot = rot
         
-        # the page to image 
-        self.pix = self.page.getPixmap(matrix=self.mat, colorspace=fitz.csRGB, alpha=USE_ALPHA)
-        self.pix2 = self.pix.getImageData("png")
+        # not in tiles
+        self.tile_key = None
+        self.tile_dl = None
+        # the preview of another page
+        self.frefine_cancel()
+        
+        # all the pages one below the other
+        if self.continuous:
+            self.fcontinuous(rot)
+            return
+        
+        # high zoom: only the visible tiles of the page are rendered
+        if tile_zoom and self.zoom >= tile_zoom:
+            self.ftiled(rot)
+            return
+        
+        self.page_x0 = 5
+        self.page_y0 = 5
+        self.fset_matrix()
+        # slow pages: a quick preview now, the page from the worker later
+        data = None
+        if progressive_ms and self.render_ms > progressive_ms and self.prefetch and self.current_page not in self.dirty_pages:
+            data = self.frender(self.current_page, rot, self.page, cached=True)
+            if data is None:
+                self.fpreview(rot)
+        if data is None and self.refine_key is None:
+            # the page to image
+            data = self.frender(self.current_page, rot, self.page)
+        if data is not None:
+            self.pix_width, self.pix_height, self.pix2 = data
+            
+            # get the image
+            self.png1 = tk.PhotoImage(data=self.pix2)
+            self.pix2 = None
         
-        # get the image
-        self.png1 = tk.PhotoImage(data=self.pix2)
-
         # reconfigure canvas
-        self.canvas.configure(width=self.pix.width+10, height=self.pix.height+10, scrollregion=(0, 0, self.pix.width+10, self.pix.height+10))
+        self.canvas.configure(width=self.pix_width+10, height=self.pix_height+10, scrollregion=(0, 0, self.pix_width+10, self.pix_height+10))
 
         # put the image on canvas
         id = self.canvas.create_image(5, 5, image=self.png1, anchor=tk.NW)
         self.canvas_list.append(id)
+        self.page_item = id
         
-        # only if the page has not been rotated
-        if abs(self.rotation) == 0:
-            # get the links in the current page
-            link = self.page.getLinks()
-            
-            if link != []:
-                self.link_list = link
-                # draw a rectangle around the links
-                self.fshow_links()
+        # the links
+        self.flinks()
+        
+        # render the next and previous pages in background
+        if self.prefetch:
+            self.fprefetch_request(rot)
+    
+    # the page at low resolution, enlarged
+    # the worker renders it at full resolution
+    def fpreview(self, rot):
+        mat = fitz.Matrix(self.zoom/preview_factor, self.zoom/preview_factor)
+        mat.preRotate(rot)
+        key = (self.current_page, self.zoom, rot, USE_ALPHA, PAGE_BG)
+        try:
+            self.prefetch.frefine(key)
+        except BrokenProcessPool:
+            # the page is rendered here
+            self.fprefetch_drop()
+            return
+        self.refine_key = key
+        self.refine_time = time.perf_counter()
+        pix = self.page.getPixmap(matrix=mat, colorspace=fitz.csRGB, alpha=USE_ALPHA)
+        self.png1 = tk.PhotoImage(data=fimage_data(pix)).zoom(preview_factor)
+        pix = None
+        # the size of the page at full resolution
+        rect = self.page.rect * self.mat
+        self.pix_width = int(rect.width + 0.5)
+        self.pix_height = int(rect.height + 0.5)
+    
+    # the page at full resolution replaces the preview
+    def frefine(self):
+        key = self.refine_key
+        self.refine_key = None
+        self.prefetch.refine = None
+        data = self.render_cache.fget(key)
+        if data is None:
+            data = self.frender(key[0], key[2], self.page)
+        else:
+            # how slow the pages of this document are
+            self.render_ms = (time.perf_counter() - self.refine_time) * 1000
+        self.pix_width, self.pix_height, self.pix2 = data
+        self.png1 = tk.PhotoImage(data=self.pix2)
+        self.pix2 = None
+        self.canvas.itemconfigure(self.page_item, image=self.png1)
+        self.canvas.configure(width=self.pix_width+10, height=self.pix_height+10, scrollregion=(0, 0, self.pix_width+10, self.pix_height+10))
+    
+    # stop waiting for the page at full resolution
+    def frefine_cancel(self):
+        if self.refine_key is not None:
+            self.refine_key = None
+            if self.prefetch:
+                self.prefetch.frefine_cancel()
+    
+    # the page in tiles
+    def ftiled(self, rot):
+        # the page area at this zoom and rotation
+        self.tile_bbox = self.page.rect * self.mat
+        self.pix_width = int(self.tile_bbox.width + 0.5)
+        self.pix_height = int(self.tile_bbox.height + 0.5)
+        self.page_x0 = 5
+        self.page_y0 = 5
+        self.fset_matrix()
+        self.canvas.configure(width=self.pix_width+10, height=self.pix_height+10, scrollregion=(0, 0, self.pix_width+10, self.pix_height+10))
+        # the content of the page is interpreted only once for all the tiles
+        self.tile_key = (self.current_page, self.zoom, rot)
+        if hasattr(self.doc, "getDisplayListCache"):
+            self.tile_dl = self.doc.getDisplayListCache().getDisplayList(self.page)
+        else:
+            self.tile_dl = self.page.getDisplayList()
+        self.ftiles()
+        # the links
+        self.flinks()
+    
+    # render the tiles in the viewport and release the others
+    def ftiles(self):
+        self.visible_after = None
+        if self.tile_key is None:
+            return
+        # the viewport in page image coords
+        x0 = self.canvas.canvasx(0) - self.page_x0
+        y0 = self.canvas.canvasy(0) - self.page_y0
+        x1 = x0 + self.canvas.winfo_width()
+        y1 = y0 + self.canvas.winfo_height()
+        # also a tile around the viewport
+        ix0 = max(int(x0 // tile_size) - 1, 0)
+        iy0 = max(int(y0 // tile_size) - 1, 0)
+        ix1 = min(int(x1 // tile_size) + 1, (self.pix_width-1) // tile_size)
+        iy1 = min(int(y1 // tile_size) + 1, (self.pix_height-1) // tile_size)
+        tiles = [(ix, iy) for iy in range(iy0, iy1+1) for ix in range(ix0, ix1+1)]
+        # release the tiles out of range
+        for tile in list(self.tiles_shown):
+            if tile not in tiles:
+                self.canvas.delete(self.tiles_shown.pop(tile)[0])
+        # render the new tiles - width, height, data and position
+        for tile in tiles:
+            if tile in self.tiles_shown:
+                continue
+            key = self.tile_key + (USE_ALPHA, PAGE_BG) + tile
+            data = self.render_cache.fget(key)
+            if data is None:
+                tx = self.tile_bbox.x0 + tile[0]*tile_size
+                ty = self.tile_bbox.y0 + tile[1]*tile_size
+                # the tile area in the page
+                clip = fitz.Rect(tx, ty, tx+tile_size, ty+tile_size) * ~self.mat
+                pix = self.tile_dl.getPixmap(matrix=self.mat, colorspace=fitz.csRGB, alpha=USE_ALPHA, clip=clip)
+                data = (pix.width, pix.height, fimage_data(pix), pix.x-self.tile_bbox.x0, pix.y-self.tile_bbox.y0)
+                pix = None
+                self.render_cache.fput(key, data)
+            img = tk.PhotoImage(data=data[2])
+            id = self.canvas.create_image(self.page_x0+data[3], self.page_y0+data[4], image=img, anchor=tk.NW)
+            # under the rectangles of the links
+            self.canvas.tag_lower(id)
+            self.tiles_shown[tile] = [id, img]
+    
+    # the page rendered: width, height and image data
+    # from the cache or the background worker if any
+    # cached: only if already rendered, otherwise None
+    def frender(self, pno, rot, page=None, cached=False):
+        key = (pno, self.zoom, rot, USE_ALPHA, PAGE_BG)
+        data = self.render_cache.fget(key)
+        # rotated: the page already in memory is turned, not rendered again
+        base = (pno, self.zoom, 0, USE_ALPHA, PAGE_BG)
+        if data is None and rot % 360 and base in self.render_cache:
+            data = frotate_data(self.render_cache.fget(base), rot)
+            if data is not None:
+                self.render_cache.fput(key, data)
+                return data
+        # the disk cache: not the pages changed and not yet saved
+        dkey = None
+        if data is None:
+            dkey = self.fdisk_key(key)
+        if data is None and self.prefetch and not cached:
+            data = self.prefetch.fget(key)
+        if data is None and dkey:
+            data = self.disk_cache.fget(dkey)
+            # already on disk
+            if data is not None:
+                dkey = None
+        if data is None and cached:
+            return None
+        if data is None:
+            if page is None:
+                page = self.doc.loadPage(pno)
+            mat = fitz.Matrix(self.zoom, self.zoom)
+            mat.preRotate(rot)
+            t0 = time.perf_counter()
+            pix = page.getPixmap(matrix=mat, colorspace=fitz.csRGB, alpha=USE_ALPHA)
+            # how slow the pages of this document are
+            self.render_ms = (time.perf_counter() - t0) * 1000
+            # raw samples - no png encoding
+            data = (pix.width, pix.height, fimage_data(pix))
+            pix = None
+        # rendered now or by the worker: on disk after the page is shown
+        if dkey:
+            self.after_idle(self.disk_cache.fput, dkey, data)
+        self.render_cache.fput(key, data)
+        return data
+    
+    # the key of a page in the disk cache or None
+    # not the pages changed and not yet saved
+    def fdisk_key(self, key):
+        if self.disk_cache and self.file_hash and key[0] not in self.dirty_pages:
+            return (self.file_hash,) + key
+        return None
+    
+    # draw the links of the current page
+    def flinks(self):
+        # get the links in the current page
+        self.link_list = self.fpage_links(self.current_page, self.page)
+        # draw a rectangle around the links
+        self.fshow_links()
+    
+    # the links of the page pno: type, rect, page or uri
+    def fpage_links(self, pno, page=None):
+        if self.link_map is not None:
+            return self.link_map.page_links[pno]
+        if page is None:
+            page = self.doc.loadPage(pno)
+        links = []
+        for item in page.getLinks():
+            if item["kind"] == fitz.LINK_GOTO:
+                links.append([1, item["from"], item["page"]])
+            elif item["kind"] == fitz.LINK_URI:
+                links.append([2, item["from"], item["uri"]])
+        return links
+    
+    # the pages one below the other at the current zoom
+    def flayout(self, rot):
+        # release the pages shown
+        for pno in list(self.shown_pages):
+            self.canvas.delete(self.shown_pages.pop(pno)[0])
+        # size of each page - only once for each document
+        if not self.page_sizes and self.fopen_sizes in self.open_stages:
+            # the document is being opened: the size of the first page
+            # for all of them until the stage reads them
+            rect = self.doc.loadPage(0).rect
+            self.page_sizes = [(rect.width, rect.height)] * self.page_count
+        elif not self.page_sizes:
+            for n in range(self.page_count):
+                rect = self.doc.loadPage(n).rect
+                self.page_sizes.append((rect.width, rect.height))
+        # top of each page
+        self.page_tops = []
+        y = 5
+        width = 0
+        for w, h in self.page_sizes:
+            if rot % 180:
+                w, h = h, w
+            self.page_tops.append(y)
+            y += int(h*self.zoom) + 11
+            width = max(width, int(w*self.zoom) + 11)
+        self.layout_width = width
+        self.layout_height = y
+        self.layout_key = (self.zoom, rot)
+        self.canvas.configure(scrollregion=(0, 0, self.layout_width, self.layout_height))
+    
+    # show the current page in the continuous layout
+    def fcontinuous(self, rot):
+        if self.layout_key != (self.zoom, rot):
+            self.flayout(rot)
+        # scroll to the current page
+        self.canvas.yview_moveto((self.page_tops[self.current_page]-5)/self.layout_height)
+        self.fcurrent(self.current_page)
+        self.fvisible()
+    
+    # the canvas has been scrolled vertically
+    def fyscroll(self, first, last):
+        self.vbar.set(first, last)
+        self.fview_changed()
+    
+    # the canvas has been scrolled horizontally
+    def fxscroll(self, first, last):
+        self.hbar.set(first, last)
+        self.fview_changed()
+    
+    # check the visible pages or tiles when idle
+    def fview_changed(self):
+        if self.visible_after is None:
+            if self.continuous:
+                self.visible_after = self.after_idle(self.fvisible)
+            elif self.tile_key is not None:
+                self.visible_after = self.after_idle(self.ftiles)
+    
+    # render the pages in the viewport and release the others
+    def fvisible(self):
+        self.visible_after = None
+        if not self.continuous or self.layout_key is None:
+            return
+        height = self.canvas.winfo_height()
+        top = self.canvas.canvasy(0)
+        bottom = top + height
+        # also a viewport above and below
+        first = max(bisect.bisect_right(self.page_tops, top-height)-1, 0)
+        last = bisect.bisect_right(self.page_tops, bottom+height)
+        # release the pages out of range
+        for pno in list(self.shown_pages):
+            if pno < first or pno >= last:
+                self.canvas.delete(self.shown_pages.pop(pno)[0])
+        # render the new pages
+        rot = self.layout_key[1]
+        for pno in range(first, last):
+            if pno not in self.shown_pages:
+                data = self.frender(pno, rot)
+                img = tk.PhotoImage(data=data[2])
+                id = self.canvas.create_image(5, self.page_tops[pno], image=img, anchor=tk.NW)
+                # under the rectangles of the links
+                self.canvas.tag_lower(id)
+                self.shown_pages[pno] = [id, img]
+        # the page at the top of the viewport
+        pno = max(bisect.bisect_right(self.page_tops, top+height/10)-1, 0)
+        if pno != self.current_page:
+            self.fcurrent(pno)
+    
+    # the page pno becomes the current page in the continuous layout
+    def fcurrent(self, pno):
+        # remove the rectangles of the previous page
+        self.fdelete()
+        for id in self.search_id:
+            self.canvas.delete(id)
+        self.search_id = []
+        #
+        self.current_page = pno
+        self.page = self.doc.loadPage(pno)
+        self.page_var.set("Page: {}/{}".format(self.current_page+1, self.page_count))
+        # where the page is
+        w, h = self.page_sizes[pno]
+        if self.layout_key[1] % 180:
+            w, h = h, w
+        self.page_x0 = 5
+        self.page_y0 = self.page_tops[pno]
+        self.fset_matrix()
+        self.pix_width = int(w*self.zoom)
+        self.pix_height = int(h*self.zoom)
+        # the links
+        self.flinks()
+        # in case a query has been performed
+        if self.dsearch == 1:
+            self.fpfbtnService()
+    
+    # the page under the canvas y coord in the continuous layout,
+    # otherwise the current page
+    def fpage_at(self, cy):
+        if self.continuous and self.layout_key is not None:
+            return max(bisect.bisect_right(self.page_tops, cy) - 1, 0)
+        return self.current_page
+    
+    # the page under the pointer becomes the current page:
+    # its matrix, links and annotations are used
+    def fpage_under(self, cy):
+        pno = self.fpage_at(cy)
+        if pno != self.current_page:
+            self.fcurrent(pno)
+    
+    # the links and the canvas to page matrix of another page
+    # of the continuous layout: the pointer moves over it
+    def fhover(self, pno):
+        if self.hover_key != (pno, self.layout_key, self.link_map is None):
+            w, h = self.page_sizes[pno]
+            mat = fitz.Matrix(self.zoom, self.zoom)
+            mat.preRotate(self.layout_key[1])
+            rect = fitz.Rect(0, 0, w, h) * mat
+            imat = ~(mat * fitz.Matrix(1, 0, 0, 1, 5 - rect.x0, self.page_tops[pno] - rect.y0))
+            grid = RectGrid()
+            for link in self.fpage_links(pno):
+                grid.fadd(fitz.Rect(link[1]), link)
+            self.hover_key = (pno, self.layout_key, self.link_map is None)
+            self.hover_links = (grid, imat)
+        return self.hover_links
+    
+    # continuous layout or one page at time
+    def fcontinuous_toggle(self):
+        self.continuous = 1 - self.continuous
+        # empty canvas
+        self.fdelete()
+        for pno in list(self.shown_pages):
+            self.canvas.delete(self.shown_pages.pop(pno)[0])
+        self.layout_key = None
+        self.fcanvas(rot=self.rotation)
+        if not self.continuous:
+            self.canvas.yview_moveto(0.001)
+    
+    # run func in the background worker
+    # callback is called in this thread with the result
+    def fbackground(self, func, callback, *args):
+        if self.bg_pool is None:
+            return
+        try:
+            self.bg_jobs.append([self.bg_pool.submit(func, *args), callback])
+        except BrokenProcessPool:
+            # the tasks are not done: the program works without them
+            self.fbackground_close()
+            return
+        if self.bg_after is None:
+            self.bg_after = self.after(50, self.fbackground_poll)
+    
+    # collect the results of the background tasks
+    def fbackground_poll(self):
+        self.bg_after = None
+        for job in self.bg_jobs[:]:
+            if job[0].done():
+                self.bg_jobs.remove(job)
+                if not job[0].cancelled() and job[0].exception() is None:
+                    job[1](job[0].result())
+        # still working
+        if self.bg_jobs:
+            self.bg_after = self.after(50, self.fbackground_poll)
+    
+    # stop the background tasks
+    def fbackground_close(self):
+        if self.bg_pool:
+            fworker_stop(self.bg_pool)
+        self.bg_pool = None
+        self.bg_jobs = []
+    
+    # the hash of the file in background
+    def fhash_start(self):
+        saves = self.saves
+        self.fbackground(fworker_hash, lambda file_hash: self.fset_hash(file_hash, saves))
+    
+    # the hash of the file is known
+    def fset_hash(self, file_hash, saves):
+        if saves == self.saves:
+            self.file_hash = file_hash
+    
+    # the link map is ready
+    def fset_links(self, links):
+        self.link_map = links
+    
+    # the search index is ready
+    def fset_index(self, index):
+        self.search_index = index
+    
+    # the file in memory for the worker processes
+    # the document of the program is still opened by name:
+    # the incremental saving needs it
+    def fload_buffer(self):
+        self.doc_buffer = None
+        if use_mmap:
+            try:
+                self.doc_buffer = fload_buffer(self.doc.name)
+            except Exception:
+                self.doc_buffer = None
+    
+    # the worker for the next and previous pages
+    def fprefetch_start(self):
+        if self.prefetch:
+            self.prefetch.fclose()
+            self.prefetch = None
+        if prefetch_depth > 0:
+            try:
+                self.prefetch = Prefetcher(self.doc.name, self.password, prefetch_depth, self.render_cache, self.doc_buffer)
+            except Exception:
+                self.prefetch = None
+                return
+            # the pages changed but not yet saved
+            for pno in self.dirty_pages:
+                self.prefetch.fdrop(pno)
+    
+    # the worker renders the pages near the current one
+    def fprefetch_request(self, rot):
+        try:
+            self.prefetch.frequest(self.current_page, self.zoom, rot, USE_ALPHA, PAGE_BG, self.page_count)
+        except BrokenProcessPool:
+            self.fprefetch_drop()
+            return
+        if self.prefetch_after is None:
+            self.prefetch_after = self.after(30, self.fprefetch_poll)
+    
+    # the worker crashed or could not open the file:
+    # the pages are rendered here from now on
+    def fprefetch_drop(self):
+        self.prefetch.fclose()
+        self.prefetch = None
+        self.refine_key = None
+    
+    # collect the pages rendered in background
+    def fprefetch_poll(self):
+        self.prefetch_after = None
+        if self.prefetch:
+            # still working
+            running = self.prefetch.fcollect()
+            # the pages rendered by the worker also on disk
+            for key, data in self.prefetch.collected:
+                dkey = self.fdisk_key(key)
+                if dkey:
+                    self.after_idle(self.disk_cache.fput, dkey, data)
+            self.prefetch.collected = []
+            # the page shown as a preview is ready (or the worker failed)
+            if self.refine_key is not None and self.refine_key not in self.prefetch.jobs:
+                self.frefine()
+            if running:
+                self.prefetch_after = self.after(30, self.fprefetch_poll)
     
     # choose a file to open
     def chooseFile(self):
@@ -1421,89 +2646,82 @@ class Application(ttk.Frame):
             self.canvas.delete(item)
             # empty the list
             self.canvas_list = []
+        # the tiles
+        for item in self.tiles_shown.values():
+            self.canvas.delete(item[0])
+        self.tiles_shown = {}
 
     # load the next page
     def fplus(self):
         # if any
         if self.current_page < self.page_count - 1:
-            self.fdelete()
             # next page
             self.current_page += 1
-            self.page = self.doc.loadPage(self.current_page)
-            #
-            self.fcanvas()
-            self.master.update_idletasks()
-            #
-            time.sleep(0.1)
             # scrollbars and canvas to the top
-            self.canvas.yview_moveto(0.001)
-            # reset
-            self.direction = 0
-            # in case a query has been performed
-            if self.dsearch == 1:
-                #
-                self.fpfbtnService()
+            self.fschedule(0, 0.001)
 
     # load the previous page
     def fminus(self):
         # if any
         if self.current_page > 0:
-            self.fdelete()
             # previous page
             self.current_page -= 1
-            self.page = self.doc.loadPage(self.current_page)
-            #
-            self.fcanvas()
-            #
-            time.sleep(0.1)
-            #
             if self.direction == 4:
                 #scrollbars and canvas to the bottom
-                self.canvas.yview_moveto(0.999)
+                self.fschedule(0, 0.999)
             else:
                 # scrollbars and canvas to the top
-                self.canvas.yview_moveto(0.001)
-            # reset
-            self.direction = 0
-            # in case a query has been performed
-            if self.dsearch == 1:
-                #
-                self.fpfbtnService()
+                self.fschedule(0, 0.001)
     
     # zoom of +0.5
     def fzoomp(self):
-        time.sleep(0.1)
         self.zoom += 0.5
-        self.fdelete()
-        self.page = self.doc.loadPage(self.current_page)
-        #
-        self.fcanvas()
+        self.fschedule(0)
     
     # zoom of -0.5
     def fzoomm(self):
-        time.sleep(0.1)
         if self.zoom > 0.5:
             self.zoom -= 0.5
-            self.fdelete()
-            self.page = self.doc.loadPage(self.current_page)
-            #
-            self.fcanvas()
+            self.fschedule(0)
 
     # left page rotation by 90 degrees
     def fleft(self):
         if self.dsearch == 0:
-            time.sleep(0.1)
-            self.rotation -= 90
-            self.fdelete()
-            self.fcanvas(rot=self.rotation)
+            self.rotation = (self.rotation - 90) % 360
+            self.fschedule(self.rotation)
     
     # right page rotation by 90 degrees
     def fright(self):
         if self.dsearch == 0:
-            time.sleep(0.1)
-            self.rotation += 90
-            self.fdelete()
-            self.fcanvas(rot=self.rotation)
+            self.rotation = (self.rotation + 90) % 360
+            self.fschedule(self.rotation)
+    
+    # the page to show: page, zoom and rotation are set at once,
+    # the page is rendered in idle time, once the pending events are done:
+    # many clicks or keys in a row render only the last page asked
+    def fschedule(self, rot, yview=None):
+        self.show_rot = rot
+        self.show_yview = yview
+        if self.show_after is None:
+            self.show_after = self.after_idle(self.fshow)
+    
+    # render the last page asked
+    def fshow(self):
+        self.show_after = None
+        self.fdelete()
+        self.page = self.doc.loadPage(self.current_page)
+        #
+        self.fcanvas(rot=self.show_rot)
+        if self.show_yview is not None:
+            self.master.update_idletasks()
+            if not self.continuous:
+                self.canvas.yview_moveto(self.show_yview)
+            # reset
+            self.direction = 0
+            # in case a query has been performed
+            if self.dsearch == 1:
+                #
+                self.fpfbtnService()
 
     # get the metadata
     def fmetadata(self):
@@ -1514,16 +2732,10 @@ class Application(ttk.Frame):
         
         rect = fitz_rect
         
-        words = self.page.getTextWords()
-
-        mywords = [w for w in words if fitz.Rect(w[:4]).intersects(rect)]
-        mywords.sort(key=itemgetter(3, 0))
-        group = groupby(mywords, key=itemgetter(3))
+        words = self.fpage_words()
+        # a line of text for each line of words
+        selected_text = words.ftext(words.flines(rect))
         
-        selected_text = ""
-        for y1, gwords in group:
-            selected_text = " ".join(w[4] for w in gwords)
-            
         # to clipboard
         # if 1 the use of the clipboard is disabled
         if self.annot_hl == 0:
@@ -1536,6 +2748,29 @@ class Application(ttk.Frame):
             # call the function
             self.fannotfe()
         
+    # the words of the current page - read once for each page
+    def fpage_words(self):
+        words = self.words_cache.get(self.current_page)
+        if words is None:
+            words = PageWords(self.page.getTextWords())
+            # the last 16 pages
+            if len(self.words_cache) >= 16:
+                self.words_cache.pop(next(iter(self.words_cache)))
+            self.words_cache[self.current_page] = words
+        return words
+    
+    # highlight the words inside the box while dragging
+    def fselect_words(self):
+        self.select_after = None
+        for id in self.select_ids:
+            self.canvas.delete(id)
+        self.select_ids = []
+        words = self.fpage_words()
+        rect = fitz.Rect(self.fpage_point(self.x1, self.y1), self.fpage_point(self.x2, self.y2)).normalize()
+        for r in words.frects(words.flines(rect)):
+            id = self.canvas.create_rectangle(*self.fcanvas_rect(r), outline="", fill="blue", stipple="gray25")
+            self.select_ids.append(id)
+    
     #
     def mouseDown(self, event):
         
@@ -1546,6 +2781,8 @@ class Application(ttk.Frame):
         
         self.startx = self.canvas.canvasx(event.x)
         self.starty = self.canvas.canvasy(event.y)
+        # the selection is in the page where it starts
+        self.fpage_under(self.starty)
 
     #
     def mouseMotion(self, event):
@@ -1559,35 +2796,70 @@ class Application(ttk.Frame):
                 self.startx, self.starty, x, y)
             
             self.master.update_idletasks()
-        ## not lesser than 0 or graiter than the page size
+        ## not outside the page
         x1 = min(self.startx,x)
-        if x1 < 0:
-            x1 = 0
+        if x1 < self.page_x0:
+            x1 = self.page_x0
         y1 = min(self.starty,y)
-        if y1 < 0:
-            y1 = 0
+        if y1 < self.page_y0:
+            y1 = self.page_y0
         x2 = max(x,self.startx)
-        if x2 > (self.pix.width):
-            x2 = (self.pix.width)
+        if x2 > (self.page_x0+self.pix_width):
+            x2 = (self.page_x0+self.pix_width)
         y2 = max(y,self.starty)
-        if y2 > self.pix.height:
-            y2 = self.pix.height
+        if y2 > self.page_y0+self.pix_height:
+            y2 = self.page_y0+self.pix_height
         
         self.x1 = x1
         self.y1 = y1
         self.x2 = x2
         self.y2 = y2
+        # once for each frame at most
+        if self.select_after is None:
+            self.select_after = self.after(16, self.fselect_words)
                 
     #
     def mouseUp(self, event):
         
         self.canvas.delete(self.rubberbandBox)
+        if self.select_after is not None:
+            self.after_cancel(self.select_after)
+            self.select_after = None
+        for id in self.select_ids:
+            self.canvas.delete(id)
+        self.select_ids = []
         # divided by the zoom value
-        self.getText(fitz.Rect(self.x1/self.zoom,self.y1/self.zoom,self.x2/self.zoom,self.y2/self.zoom))
+        self.getText(fitz.Rect(self.fpage_point(self.x1, self.y1), self.fpage_point(self.x2, self.y2)).normalize())
         # reset self.annot_hl
         # if 1 the use of the clipboard is disabled
         self.annot_hl = 0
 
+    # close the program
+    def fquit(self):
+        # the annotations not yet saved
+        self.fsave_flush(reopen=False)
+        # print the counters of the caches
+        if print_stats:
+            if self.prefetch:
+                print(self.prefetch.fstats())
+            else:
+                print("Cache: {} hits, {} misses".format(self.render_cache.hits, self.render_cache.misses))
+            if self.disk_cache:
+                print("Disk cache: {} hits, {} misses".format(self.disk_cache.hits, self.disk_cache.misses))
+            if self.doc and not self.doc.isClosed and hasattr(self.doc, "getDisplayListCache"):
+                print(self.doc.getDisplayListCache().stats())
+        # the worker processes: no waiting for their jobs
+        self.fbackground_close()
+        self.fsearch_cancel()
+        if self.search_pool:
+            fworker_stop(self.search_pool)
+            self.search_pool = None
+        self.fthumbs_close()
+        if self.prefetch:
+            self.prefetch.fclose()
+            self.prefetch = None
+        quit()
+    
     # store the window size at every user resizing
     def fsizegrip(self, event):
         try:
@@ -1922,6 +3194,98 @@ class dialogMetadata:
         y = (hs/2) - (h/2)
         self.top.geometry('+{}+{}'.format(int(x), int(y)))
 
+# dialog for the results of the searching in the whole document
+class dialogResults:
+    
+    def __init__(self, parent, app):
+        self.top = tk.Toplevel(parent)
+        self.parent = parent
+        self.app = app
+        
+        # page and position of each hit
+        self.hits = [(pno, i) for pno, areas in enumerate(self.app.areas_list) for i in range(len(areas))]
+        self.top.title("{} results".format(len(self.hits)))
+        
+        self.frame = ttk.Frame(self.top)
+        self.frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.lb = tk.Listbox(self.frame, font=("", font_size), width=25, height=20, exportselection=False)
+        self.lb.pack(side="left", fill="both", expand=True)
+        self.sb = ttk.Scrollbar(self.frame, orient="vertical", command=self.lb.yview)
+        self.sb.pack(side="left", fill="y")
+        self.lb.configure(yscrollcommand=self.sb.set)
+        self.lb.insert(tk.END, *["Page {}: {}".format(pno+1, i+1) for pno, i in self.hits])
+        self.lb.bind("<<ListboxSelect>>", self.fselect)
+        
+        b = ttk.Button(self.top, text="Close", command=self.top.destroy)
+        b.pack()
+        
+        self.parent.update_idletasks()
+        # this dialod is centered
+        w = self.top.winfo_reqwidth()
+        h = self.top.winfo_reqheight()
+        ws = self.top.winfo_screenwidth()
+        hs = self.top.winfo_screenheight()
+        x = (ws/2) - (w/2)
+        y = (hs/2) - (h/2)
+        self.top.geometry('+{}+{}'.format(int(x), int(y)))
+    
+    # go to the selected hit
+    def fselect(self, event):
+        sel = self.lb.curselection()
+        if sel:
+            pno, i = self.hits[sel[0]]
+            # the results of another searching
+            if pno < len(self.app.areas_list) and i < len(self.app.areas_list[pno]):
+                self.app.fgoto_hit(pno, i)
+
+# the pages with links to the current page
+class dialogBacklinks:
+    
+    def __init__(self, parent, app):
+        self.top = tk.Toplevel(parent)
+        self.parent = parent
+        self.app = app
+        
+        # page and position of each link
+        self.links = self.app.link_map.backlinks.get(self.app.current_page, [])
+        self.top.title("Links to page {}".format(self.app.current_page+1))
+        
+        self.frame = ttk.Frame(self.top)
+        self.frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.lb = tk.Listbox(self.frame, font=("", font_size), width=25, height=15, exportselection=False)
+        self.lb.pack(side="left", fill="both", expand=True)
+        self.sb = ttk.Scrollbar(self.frame, orient="vertical", command=self.lb.yview)
+        self.sb.pack(side="left", fill="y")
+        self.lb.configure(yscrollcommand=self.sb.set)
+        if self.links:
+            self.lb.insert(tk.END, *["Page {}".format(pno+1) for pno, k in self.links])
+        else:
+            self.lb.insert(tk.END, "No links")
+        self.lb.bind("<<ListboxSelect>>", self.fselect)
+        
+        b = ttk.Button(self.top, text="Close", command=self.top.destroy)
+        b.pack()
+        
+        self.parent.update_idletasks()
+        # this dialod is centered
+        w = self.top.winfo_reqwidth()
+        h = self.top.winfo_reqheight()
+        ws = self.top.winfo_screenwidth()
+        hs = self.top.winfo_screenheight()
+        x = (ws/2) - (w/2)
+        y = (hs/2) - (h/2)
+        self.top.geometry('+{}+{}'.format(int(x), int(y)))
+    
+    # go to the selected link
+    def fselect(self, event):
+        sel = self.lb.curselection()
+        if sel and self.links:
+            # the link map of another document
+            if self.app.link_map is None:
+                return
+            pno, k = self.links[sel[0]]
+            self.app.fgoto_link(pno, k)
+
 # dialog for searching text
 class dialogSearching:
     
@@ -1979,4 +3343,5 @@ height = app_height
 root.geometry('{}x{}'.format(width, height))
 
 app = Application(master=root)
+root.protocol('WM_DELETE_WINDOW', app.fquit)
 app.mainloop()